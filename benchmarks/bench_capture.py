@@ -0,0 +1,51 @@
+"""
+Compare PNG screencap against the raw framebuffer path through a fake ADB
+server. Both paths go through ADBController and end in a BGR frame.
+
+    python -m benchmarks.bench_capture [--width 1920 --height 1080 --iterations 30]
+"""
+
+import argparse
+
+import cv2
+import numpy as np
+
+from benchmarks.common import print_result, synthetic_frame, template_paths, time_call
+from benchmarks.fake_adb import FakeAdbServer
+from src.core.adb import ADBController, CAPTURE_MODE_PNG, CAPTURE_MODE_RAW
+from src.core.framebuffer import parse_raw_screencap
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--iterations", type=int, default=30)
+    args = parser.parse_args()
+
+    frame = synthetic_frame(args.width, args.height, template_paths())
+    with FakeAdbServer(frame) as server:
+        adb = ADBController(device_id=server.serial, host=server.host, port=server.port)
+
+        def capture_png():
+            adb.capture_mode = CAPTURE_MODE_PNG
+            return cv2.imdecode(np.frombuffer(adb.capture_screen_raw(), np.uint8), cv2.IMREAD_COLOR)
+
+        def capture_raw():
+            adb.capture_mode = CAPTURE_MODE_RAW
+            return parse_raw_screencap(adb.capture_screen_framebuffer()).to_bgr()
+
+        assert np.array_equal(capture_png(), frame)
+        assert np.array_equal(capture_raw(), frame)
+
+        print(f"Frame {args.width}x{args.height}: PNG {len(server.png_payload) / 1024:.0f} KiB, "
+              f"raw {len(server.raw_payload) / 1024:.0f} KiB (device-side PNG encode not included)")
+        png = time_call(capture_png, args.iterations)
+        raw = time_call(capture_raw, args.iterations)
+        print_result(f"capture {CAPTURE_MODE_PNG} + decode", png)
+        print_result(f"capture {CAPTURE_MODE_RAW} + convert", raw)
+        print(f"Speedup: {png['mean_ms'] / raw['mean_ms']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Compare the vectorized candidate extraction + NMS used by find_all_templates
+against the previous per-pixel Python loop, on bundled templates pasted into
+a synthetic frame. Fails if any result differs.
+
+    python -m benchmarks.bench_find_all [--threshold 0.5 --iterations 5]
+"""
+
+import argparse
+import os
+
+import cv2
+import numpy as np
+
+from benchmarks.common import synthetic_frame, template_paths, time_call
+from src.core.matching import extract_matches
+
+
+def legacy_extract_matches(result, threshold, template_w, template_h, roi_offset_x=0, roi_offset_y=0):
+    """The loop find_all_templates used before extract_matches."""
+    locations = np.where(result >= threshold)
+    matches = []
+    candidates = []
+    for pt in zip(*locations[::-1]):
+        x, y = pt
+        confidence = result[y, x]
+        final_x = x + roi_offset_x + template_w // 2
+        final_y = y + roi_offset_y + template_h // 2
+        candidates.append((final_x, final_y, confidence))
+    candidates.sort(key=lambda x: x[2], reverse=True)
+    min_distance = max(template_w, template_h) * 0.8
+    for candidate in candidates:
+        x, y, confidence = candidate
+        is_duplicate = False
+        for existing_match in matches:
+            existing_x, existing_y, _ = existing_match
+            distance = np.sqrt((x - existing_x)**2 + (y - existing_y)**2)
+            if distance < min_distance:
+                is_duplicate = True
+                break
+        if not is_duplicate:
+            matches.append((x, y, confidence))
+    return matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--game", default="dau-la")
+    args = parser.parse_args()
+
+    paths = template_paths(args.game)
+    screen = cv2.cvtColor(synthetic_frame(templates=paths + paths), cv2.COLOR_BGR2GRAY)
+    total_legacy = total_new = 0.0
+    for path in paths:
+        template = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if template is None or template.shape[0] > screen.shape[0] or template.shape[1] > screen.shape[1]:
+            continue
+        h, w = template.shape[:2]
+        result = cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED)
+        candidates = int(np.count_nonzero(result >= args.threshold))
+
+        expected = legacy_extract_matches(result, args.threshold, w, h)
+        actual = extract_matches(result, args.threshold, w, h)
+        if expected != actual:
+            raise SystemExit(f"Mismatch for {path}: {len(expected)} legacy vs {len(actual)} vectorized matches")
+
+        legacy = time_call(lambda: legacy_extract_matches(result, args.threshold, w, h), args.iterations, warmup=0)
+        new = time_call(lambda: extract_matches(result, args.threshold, w, h), args.iterations)
+        total_legacy += legacy["mean_ms"]
+        total_new += new["mean_ms"]
+        name = os.path.relpath(path, "assets")
+        print(f"{name:<40} {candidates:>7} candidates {len(actual):>4} matches  "
+              f"legacy {legacy['mean_ms']:9.2f} ms  vectorized {new['mean_ms']:7.2f} ms")
+
+    print(f"Total: legacy {total_legacy:.2f} ms, vectorized {total_new:.2f} ms, "
+          f"speedup {total_legacy / max(total_new, 1e-9):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
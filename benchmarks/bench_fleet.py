@@ -0,0 +1,87 @@
+"""
+Load-test the discovery scan and the multi-device orchestrator against a
+fake ADB server emulating many devices, each on its own port.
+
+    python -m benchmarks.bench_fleet [--devices 32 --closed-ports 200 --seconds 10 --latency screencap=0.03 input=0.005]
+"""
+
+import argparse
+import socket
+import time
+
+from benchmarks.common import synthetic_frame, template_paths
+from benchmarks.fake_adb import FakeAdbServer, FrameSource, parse_latency
+from src.core.adb_auto import ADBGameAutomation
+from src.core.discovery import discover_devices
+from src.core.orchestrator import DeviceOrchestrator
+from src.core.roi_prior import RoiPriorIndex
+
+
+def _closed_endpoints(count: int):
+    """Endpoints on ports nothing listens on (bound, then released)."""
+    sockets = [socket.socket() for _ in range(count)]
+    for sock in sockets:
+        sock.bind(("127.0.0.1", 0))
+    endpoints = [f"127.0.0.1:{sock.getsockname()[1]}" for sock in sockets]
+    for sock in sockets:
+        sock.close()
+    return endpoints
+
+
+class _TapBot(ADBGameAutomation):
+    """Looks for one template per loop and taps it, like a minimal game."""
+
+    template = None
+
+    def __init__(self, **kwargs):
+        ADBGameAutomation.__init__(self, **kwargs)
+        self.debug_sink.enabled = False
+        # Synthetic hits must not end up in the priors live bots load
+        self.roi_prior = RoiPriorIndex(path=None)
+
+    def process_game_actions(self):
+        match = self.find_template(self.template, debug=False)
+        if match:
+            self.tap(match[0], match[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=32)
+    parser.add_argument("--closed-ports", type=int, default=200, help="Extra endpoints with nothing listening")
+    parser.add_argument("--seconds", type=float, default=10.0, help="How long to run the bots")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=360)
+    parser.add_argument("--latency", nargs="*", default=[], metavar="KEY=SECONDS")
+    args = parser.parse_args()
+
+    templates = template_paths("cherry_tale")[:1]
+    _TapBot.template = templates[0]
+    frames = FrameSource.static(synthetic_frame(args.width, args.height, templates))
+    with FakeAdbServer(frames=frames, latency=parse_latency(args.latency)) as server:
+        endpoints = server.add_emulators(args.devices)
+
+        found = discover_devices(endpoints + _closed_endpoints(args.closed_ports), server.host, server.port)
+        connected = [endpoint for _, endpoint in found if endpoint]
+        print(f"Discovery: {len(connected)}/{len(endpoints)} emulators connected "
+              f"out of {len(endpoints) + args.closed_ports} endpoints")
+
+        orchestrator = DeviceOrchestrator(_TapBot, endpoints, server.host, server.port, report_interval=0)
+        orchestrator.start()
+        time.sleep(args.seconds)
+        status = orchestrator.get_status()
+        orchestrator.stop()
+
+        running = [info for info in status.values() if info["status"] != "failed"]
+        loops = sum(info["loops"] for info in running)
+        captures = sum(info["captures_per_s"] for info in running)
+        taps = sum(len(device.input_commands) for device in server.remote.values())
+        print(f"Bots: {len(running)}/{len(endpoints)} running, {loops} loops "
+              f"({loops / args.seconds:.1f}/s total), {captures:.1f} captures/s total, {taps} taps received")
+        for serial, info in sorted(status.items()):
+            if info["status"] == "failed":
+                print(f"  {serial}: failed ({info['error']})")
+
+
+if __name__ == "__main__":
+    main()
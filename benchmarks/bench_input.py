@@ -0,0 +1,36 @@
+"""
+Compare tap latency through one-shot ``device.shell`` calls against the
+persistent input shell, using the fake ADB server.
+
+    python -m benchmarks.bench_input [--iterations 200 --tap-count 5]
+"""
+
+import argparse
+
+from benchmarks.common import print_result, synthetic_frame, time_call
+from benchmarks.fake_adb import FakeAdbServer
+from src.core.adb import ADBController
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--tap-count", type=int, default=5)
+    args = parser.parse_args()
+
+    with FakeAdbServer(synthetic_frame(320, 180)) as server:
+        adb = ADBController(device_id=server.serial, host=server.host, port=server.port)
+
+        for persistent in (False, True):
+            adb.persistent_shell = persistent
+            label = "persistent shell" if persistent else "one-shot shell"
+            print_result(f"tap ({label})", time_call(lambda: adb.tap(100, 200, duration=0), args.iterations))
+            print_result(f"tap x{args.tap_count} ({label})",
+                         time_call(lambda: adb.tap(100, 200, duration=0, tap_count=args.tap_count), args.iterations))
+
+        print(f"Input shell stats: {adb.get_input_stats()}")
+        print(f"Commands received by fake server: {len(server.input_commands)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Compare coarse-to-fine pyramid matching with full-resolution matching on the
+bundled templates: location agreement (pixel tolerance) and speed.
+
+    python -m benchmarks.bench_pyramid [--scale 0.5 --tolerance 2 --iterations 5]
+"""
+
+import argparse
+import os
+
+from benchmarks.common import synthetic_frame, template_paths, time_call
+from src.core.frame import Frame
+from src.core.matching import PYRAMID_THRESHOLD_SLACK, match_template, match_template_pyramid
+from src.core.template_cache import template_cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=0.5)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--tolerance", type=int, default=2)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--grayscale", action="store_true")
+    parser.add_argument("--game", default=None, help="Limit to one assets/<game> directory")
+    args = parser.parse_args()
+
+    total_full = total_pyramid = 0.0
+    disagreements = 0
+    for path in template_paths(args.game):
+        # One template per frame at a random spot, so every template is present
+        frame = Frame(0, synthetic_frame(templates=[path], seed=len(path), scatter=True))
+        screen = frame.gray() if args.grayscale else frame.image
+        template = template_cache.get(path, args.grayscale)
+        scaled_template = template_cache.get_scaled(path, args.grayscale, args.scale)
+        if template is None or template.shape[0] > screen.shape[0] or template.shape[1] > screen.shape[1]:
+            continue
+
+        def full():
+            return match_template(screen, template)
+
+        def pyramid():
+            return match_template_pyramid(screen, template, frame.scaled(args.scale, args.grayscale), scaled_template,
+                                          args.scale, args.threshold - PYRAMID_THRESHOLD_SLACK)
+
+        full_val, full_loc = full()
+        pyramid_val, pyramid_loc = pyramid()
+        found_full = full_val >= args.threshold
+        found_pyramid = pyramid_val >= args.threshold
+        offset = max(abs(full_loc[0] - pyramid_loc[0]), abs(full_loc[1] - pyramid_loc[1]))
+        agree = found_full == found_pyramid and (not found_full or offset <= args.tolerance)
+        disagreements += not agree
+
+        full_time = time_call(full, args.iterations)["mean_ms"]
+        pyramid_time = time_call(pyramid, args.iterations)["mean_ms"]
+        total_full += full_time
+        total_pyramid += pyramid_time
+        print(f"{os.path.relpath(path, 'assets'):<44} full {full_val:.3f}@{full_loc} {full_time:7.2f} ms  "
+              f"pyramid {pyramid_val:.3f}@{pyramid_loc} {pyramid_time:7.2f} ms  {'ok' if agree else 'DIFF'}")
+
+    print(f"Total: full {total_full:.1f} ms, pyramid {total_pyramid:.1f} ms, "
+          f"speedup {total_full / max(total_pyramid, 1e-9):.1f}x, disagreements {disagreements}")
+
+
+if __name__ == "__main__":
+    main()
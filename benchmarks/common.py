@@ -0,0 +1,67 @@
+import glob
+import os
+import time
+from typing import Callable, List, Optional
+
+import cv2
+import numpy as np
+
+ASSETS_DIR = "assets"
+
+
+def template_paths(game: Optional[str] = None) -> List[str]:
+    """Bundled template PNGs, optionally limited to one game."""
+    pattern = os.path.join(ASSETS_DIR, game or "*", "templates", "**", "*.png")
+    return sorted(glob.glob(pattern, recursive=True))
+
+
+def synthetic_frame(width: int = 1920, height: int = 1080, templates: Optional[List[str]] = None, seed: int = 0,
+                    scatter: bool = False) -> np.ndarray:
+    """Noise background with the given templates pasted in rows, or at random
+    positions when ``scatter`` is set."""
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    frame = cv2.GaussianBlur(frame, (7, 7), 0)
+    x, y, row_height = 10, 10, 0
+    for path in templates or []:
+        template = cv2.imread(path, cv2.IMREAD_COLOR)
+        if template is None:
+            continue
+        h, w = template.shape[:2]
+        if scatter:
+            if w <= width and h <= height:
+                px, py = int(rng.integers(0, width - w + 1)), int(rng.integers(0, height - h + 1))
+                frame[py:py + h, px:px + w] = template
+            continue
+        if x + w > width:
+            x, y, row_height = 10, y + row_height + 10, 0
+        if y + h > height:
+            break
+        frame[y:y + h, x:x + w] = template
+        x += w + 10
+        row_height = max(row_height, h)
+    return frame
+
+
+def time_call(func: Callable, iterations: int = 20, warmup: int = 2) -> dict:
+    """Run ``func`` repeatedly and return per-call timings in milliseconds."""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    samples.sort()
+    return {
+        "iterations": iterations,
+        "mean_ms": sum(samples) / len(samples),
+        "median_ms": samples[len(samples) // 2],
+        "min_ms": samples[0],
+        "max_ms": samples[-1],
+    }
+
+
+def print_result(name: str, result: dict):
+    print(f"{name:<40} mean {result['mean_ms']:8.2f} ms  median {result['median_ms']:8.2f} ms  "
+          f"min {result['min_ms']:8.2f} ms  ({result['iterations']} runs)")
@@ -0,0 +1,443 @@
+"""
+Fake ADB server for benchmarks and load tests, no emulator needed.
+
+Speaks the ADB smart-socket protocol for ``host:version``, ``host:devices``,
+``host:connect``/``host:disconnect``, ``host:transport:<serial>``, the
+screencap commands (PNG or raw RGBA framebuffer), ``wm size`` and shell
+input (one-shot or interactive ``shell:``). Devices show frames from a
+static image, a directory of PNGs or a recorded session, every command can
+be given a latency, and every input command is recorded.
+
+Emulated devices can also listen on their own port, like an emulator's
+adbd, so the discovery scan and the multi-device paths can be load-tested
+with dozens of devices:
+
+    python -m benchmarks.fake_adb --devices 32 [--frames recordings/<session>] [--latency screencap=0.03 input=0.005]
+"""
+
+import argparse
+import bisect
+import glob
+import os
+import re
+import socket
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from src.core.framebuffer import PIXEL_FORMAT_RGBA_8888, encode_raw_screencap
+from src.core.session_recorder import SessionReader
+
+_PRINTF_ACK = re.compile(r"printf '(__ack_)%d(__)\\n' (\d+)")
+
+# Per-command latency keys (seconds, applied before replying)
+LATENCY_KEYS = ("devices", "connect", "screencap", "input", "shell")
+# ADB server protocol version reported by host:version
+ADB_SERVER_VERSION = 41
+
+
+class FrameSource:
+    """Frames a fake device shows in turn, each from its start offset until
+    the next one, looping. Encoded payloads are cached per frame."""
+
+    def __init__(self, frames: Sequence, offsets: Optional[Sequence[float]] = None, interval: float = 1.0,
+                 duration: Optional[float] = None, cache_size: int = 16):
+        if not len(frames):
+            raise ValueError("FrameSource needs at least one frame")
+        self._frames = frames
+        self.offsets = list(offsets) if offsets is not None else [i * interval for i in range(len(frames))]
+        self.duration = duration if duration is not None else self.offsets[-1] + interval
+        self.start_time = time.time()
+        self._cache: "OrderedDict[Tuple[str, int], bytes]" = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+        self.height, self.width = self.image(0).shape[:2]
+
+    @classmethod
+    def static(cls, frame: np.ndarray) -> "FrameSource":
+        return cls([frame])
+
+    @classmethod
+    def from_directory(cls, path: str, interval: float = 1.0) -> "FrameSource":
+        """PNG files in ``path``, in name order, each shown for ``interval`` seconds."""
+        files = sorted(glob.glob(os.path.join(path, "*.png")))
+        if not files:
+            raise ValueError(f"No PNG files in {path}")
+        return _DirectoryFrames(files, interval=interval)
+
+    @classmethod
+    def from_session(cls, path: str) -> "FrameSource":
+        """A recorded session, played back with its original timing."""
+        session = SessionReader(path)
+        if not len(session):
+            raise ValueError(f"Session {path} has no frames")
+        start = session.timestamps[0]
+        offsets = [timestamp - start for timestamp in session.timestamps]
+        duration = max(offsets[-1], session.meta.get("stopped", 0.0) - start) + 1.0
+        return _SessionFrames(session, offsets, duration=duration)
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def image(self, index: int) -> np.ndarray:
+        return self._frames[index]
+
+    def current_index(self) -> int:
+        elapsed = (time.time() - self.start_time) % self.duration
+        return max(bisect.bisect_right(self.offsets, elapsed) - 1, 0)
+
+    def _encode(self, kind: str, index: int) -> bytes:
+        if kind == "png":
+            return cv2.imencode(".png", self.image(index))[1].tobytes()
+        # What screencap writes without -p on most devices
+        return encode_raw_screencap(self.image(index), PIXEL_FORMAT_RGBA_8888)
+
+    def payload(self, kind: str, index: Optional[int] = None) -> bytes:
+        """PNG (``kind="png"``) or raw framebuffer bytes of a frame (default: the current one)."""
+        key = (kind, self.current_index() if index is None else index)
+        with self._lock:
+            payload = self._cache.get(key)
+            if payload is not None:
+                self._cache.move_to_end(key)
+                return payload
+        payload = self._encode(*key)
+        with self._lock:
+            self._cache[key] = payload
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return payload
+
+
+class _DirectoryFrames(FrameSource):
+    def image(self, index: int) -> np.ndarray:
+        return cv2.imread(self._frames[index], cv2.IMREAD_COLOR)
+
+    def _encode(self, kind: str, index: int) -> bytes:
+        if kind == "png":
+            with open(self._frames[index], "rb") as file:
+                return file.read()
+        return super()._encode(kind, index)
+
+
+class _SessionFrames(FrameSource):
+    def image(self, index: int) -> np.ndarray:
+        return self._frames.frame(index)[1]
+
+
+class FakeDevice:
+    """One emulated device: its screen, the inputs it received and optionally
+    an endpoint port that accepts TCP connections (like an emulator's adbd)."""
+
+    def __init__(self, serial: str, frames: FrameSource):
+        self.serial = serial
+        self.frames = frames
+        self.input_commands: List[str] = []
+        # (time received, command)
+        self.input_log: List[Tuple[float, str]] = []
+        self.screencaps = 0
+        self._listener: Optional[socket.socket] = None
+
+    def record_input(self, command: str):
+        self.input_commands.append(command)
+        self.input_log.append((time.time(), command))
+
+    def listen(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Accept (and drop) TCP connections on ``host:port``; returns the endpoint."""
+        self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind((host, port))
+        self._listener.listen(64)
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        host, port = self._listener.getsockname()
+        return f"{host}:{port}"
+
+    def _accept_loop(self):
+        while self._listener is not None:
+            try:
+                conn, _ = self._listener.accept()
+            except OSError:
+                break
+            conn.close()
+
+    def close(self):
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            try:
+                listener.close()
+            except OSError:
+                pass
+
+
+class FakeAdbServer:
+    """ADB server with one attached device, plus any number of remote devices
+    that appear in ``host:devices`` once ``host:connect`` reaches them.
+
+    ``latency`` maps LATENCY_KEYS to seconds added before each reply.
+    """
+
+    def __init__(self, frame: Optional[np.ndarray] = None, serial: str = "emulator-5554", host: str = "127.0.0.1",
+                 port: int = 0, remote_endpoints=(), frames: Optional[FrameSource] = None,
+                 latency: Optional[Dict[str, float]] = None):
+        if frames is None:
+            if frame is None:
+                raise ValueError("FakeAdbServer needs a frame or a FrameSource")
+            frames = FrameSource.static(frame)
+        self.serial = serial
+        self.frames = frames
+        self.latency = dict(latency or {})
+        unknown = set(self.latency) - set(LATENCY_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown latency keys: {sorted(unknown)}")
+        self.devices: Dict[str, FakeDevice] = {serial: FakeDevice(serial, frames)}
+        # Devices listed by host:devices; remote ones join after host:connect
+        self.attached: List[str] = [serial]
+        self.remote: Dict[str, FakeDevice] = {}
+        for endpoint in remote_endpoints:
+            self.remote[endpoint] = FakeDevice(endpoint, frames)
+        self.connected: List[str] = []
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((host, port))
+        self._server.listen(256)
+        self.host, self.port = self._server.getsockname()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    @property
+    def device(self) -> FakeDevice:
+        """The attached default device."""
+        return self.devices[self.serial]
+
+    @property
+    def input_commands(self) -> List[str]:
+        return self.device.input_commands
+
+    @property
+    def height(self) -> int:
+        return self.frames.height
+
+    @property
+    def width(self) -> int:
+        return self.frames.width
+
+    @property
+    def png_payload(self) -> bytes:
+        return self.frames.payload("png")
+
+    @property
+    def raw_payload(self) -> bytes:
+        return self.frames.payload("raw")
+
+    def add_emulators(self, count: int, frames: Optional[FrameSource] = None) -> List[str]:
+        """Start ``count`` remote devices, each listening on its own port; returns their endpoints."""
+        endpoints = []
+        for _ in range(count):
+            device = FakeDevice("", frames or self.frames)
+            device.serial = device.listen(self.host)
+            with self._lock:
+                self.remote[device.serial] = device
+            endpoints.append(device.serial)
+        return endpoints
+
+    def start(self) -> "FakeAdbServer":
+        self._running = True
+        self._thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        try:
+            self._server.close()
+        except OSError:
+            pass
+        for device in list(self.remote.values()):
+            device.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, type, value, traceback):
+        self.stop()
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _delay(self, key: str):
+        seconds = self.latency.get(key)
+        if seconds:
+            time.sleep(seconds)
+
+    @staticmethod
+    def _read_request(conn: socket.socket) -> Optional[str]:
+        length = _recv_exact(conn, 4)
+        if not length:
+            return None
+        return _recv_exact(conn, int(length, 16)).decode("utf-8")
+
+    @staticmethod
+    def _reply(conn: socket.socket, message: str):
+        body = message.encode("utf-8")
+        conn.sendall(b"OKAY" + f"{len(body):04x}".encode("utf-8") + body)
+
+    def _find_device(self, request: str) -> Optional[FakeDevice]:
+        with self._lock:
+            if request == "host:transport-any":
+                return self.devices.get(self.attached[0]) if self.attached else None
+            serial = request[len("host:transport:"):]
+            if serial in self.attached:
+                return self.devices.get(serial)
+            if serial in self.connected:
+                return self.remote.get(serial)
+        return None
+
+    def _handle(self, conn: socket.socket):
+        with conn:
+            try:
+                request = self._read_request(conn)
+                if request is None:
+                    return
+                self.requests += 1
+                if request == "host:version":
+                    self._reply(conn, f"{ADB_SERVER_VERSION:04x}")
+                    return
+                if request == "host:devices":
+                    self._delay("devices")
+                    with self._lock:
+                        serials = self.attached + self.connected
+                    self._reply(conn, "".join(f"{serial}\tdevice\n" for serial in serials))
+                    return
+                if request.startswith("host:connect:"):
+                    self._delay("connect")
+                    endpoint = request[len("host:connect:"):]
+                    with self._lock:
+                        known = endpoint in self.remote
+                        if known and endpoint not in self.connected:
+                            self.connected.append(endpoint)
+                    self._reply(conn, f"connected to {endpoint}" if known else f"failed to connect to {endpoint}")
+                    return
+                if request.startswith("host:disconnect:"):
+                    endpoint = request[len("host:disconnect:"):]
+                    with self._lock:
+                        if endpoint in self.connected:
+                            self.connected.remove(endpoint)
+                    self._reply(conn, f"disconnected {endpoint}")
+                    return
+                device = self._find_device(request) if request.startswith("host:transport") else None
+                if device is None:
+                    conn.sendall(b"FAIL0007unknown")
+                    return
+                conn.sendall(b"OKAY")
+                self._handle_device(conn, device, self._read_request(conn))
+            except OSError:
+                pass
+
+    def _handle_device(self, conn: socket.socket, device: FakeDevice, request: Optional[str]):
+        if request in ("shell:/system/bin/screencap -p", "shell:screencap -p", "exec:screencap -p"):
+            self._delay("screencap")
+            device.screencaps += 1
+            conn.sendall(b"OKAY" + device.frames.payload("png"))
+        elif request == "exec:screencap":
+            self._delay("screencap")
+            device.screencaps += 1
+            conn.sendall(b"OKAY" + device.frames.payload("raw"))
+        elif request == "shell:wm size":
+            self._delay("shell")
+            conn.sendall(b"OKAY" + f"Physical size: {device.frames.width}x{device.frames.height}\n".encode("utf-8"))
+        elif request == "shell:":
+            conn.sendall(b"OKAY")
+            self._interactive_shell(conn, device)
+        elif request is not None and request.startswith("shell:input "):
+            self._delay("input")
+            device.record_input(request[len("shell:"):])
+            conn.sendall(b"OKAY")
+        else:
+            self._delay("shell")
+            conn.sendall(b"OKAY")
+
+    def _interactive_shell(self, conn: socket.socket, device: FakeDevice):
+        buffer = b""
+        while True:
+            chunk = conn.recv(4096)
+            if not chunk:
+                return
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            replies = []
+            for line in lines:
+                for command in line.decode("utf-8").split(";"):
+                    command = command.strip()
+                    ack = _PRINTF_ACK.fullmatch(command)
+                    if ack:
+                        replies.append(f"{ack.group(1)}{ack.group(3)}{ack.group(2)}\n")
+                    elif command.startswith("input "):
+                        self._delay("input")
+                        device.record_input(command)
+            if replies:
+                conn.sendall("".join(replies).encode("utf-8"))
+
+
+def _recv_exact(conn: socket.socket, length: int) -> bytes:
+    data = bytearray()
+    while len(data) < length:
+        chunk = conn.recv(length - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return bytes(data)
+
+
+def parse_latency(values: Sequence[str]) -> Dict[str, float]:
+    latency = {}
+    for value in values:
+        key, _, seconds = value.partition("=")
+        latency[key] = float(seconds)
+    return latency
+
+
+def main():
+    from benchmarks.common import synthetic_frame, template_paths
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=5037, help="ADB server port to listen on")
+    parser.add_argument("--devices", type=int, default=0, help="Emulated devices on their own ports (connect first)")
+    parser.add_argument("--frames", help="Directory of PNGs or a recorded session directory")
+    parser.add_argument("--interval", type=float, default=1.0, help="Seconds per frame for a PNG directory")
+    parser.add_argument("--latency", nargs="*", default=[], metavar="KEY=SECONDS",
+                        help=f"Per-command latency, keys: {', '.join(LATENCY_KEYS)}")
+    args = parser.parse_args()
+
+    if args.frames and os.path.exists(os.path.join(args.frames, "session.json")):
+        frames = FrameSource.from_session(args.frames)
+    elif args.frames:
+        frames = FrameSource.from_directory(args.frames, args.interval)
+    else:
+        frames = FrameSource.static(synthetic_frame(1920, 1080, template_paths()))
+    with FakeAdbServer(frames=frames, port=args.port, latency=parse_latency(args.latency)) as server:
+        endpoints = server.add_emulators(args.devices)
+        print(f"Fake ADB server on {server.host}:{server.port}, attached device {server.serial}")
+        if endpoints:
+            print(f"Emulators ({len(endpoints)}): {' '.join(endpoints)}")
+        try:
+            while True:
+                time.sleep(1.0)
+        except KeyboardInterrupt:
+            pass
+        for device in [server.device] + list(server.remote.values()):
+            if device.input_commands or device.screencaps:
+                print(f"{device.serial}: {device.screencaps} screencaps, {len(device.input_commands)} inputs")
+
+
+if __name__ == "__main__":
+    main()
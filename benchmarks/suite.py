@@ -0,0 +1,290 @@
+"""
+Benchmark suite over the bundled templates, with JSON baselines.
+
+Times template loading, find_template (color and grayscale),
+find_all_templates, batch_match_templates, screencap decoding and
+end-to-end process_game_actions iterations replayed on a virtual clock.
+Results are written as JSON; compare flags entries whose median got slower
+than the baseline by more than the tolerance (and exits non-zero).
+
+    python -m benchmarks.suite run [--output baseline.json] [--session recordings/<session>] [--only find_template]
+    python -m benchmarks.suite compare baseline.json current.json [--tolerance 0.15]
+    python -m benchmarks.suite run --compare baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from benchmarks.common import synthetic_frame, template_paths, time_call
+from src.core.base_auto import BaseGameAutomation
+from src.core.clock import VirtualClock
+from src.core.debug_sink import debug_sink
+from src.core.frame import Frame
+from src.core.framebuffer import PIXEL_FORMAT_RGBA_8888, encode_raw_screencap, parse_raw_screencap
+from src.core.replay import ReplayController
+from src.core.session_recorder import SessionReader, SessionRecorder
+from src.core.template_cache import load_template, template_cache
+from src.games.cherry_tale.cherry_tale import CherryTale
+from src.games.dau_la.dau_la import DauLa
+
+DEFAULT_RESULTS_DIR = os.path.join("cache", "benchmarks")
+DEFAULT_TOLERANCE = 0.15
+# Game templates used by the matching benchmarks
+MATCH_GAME = "dau-la"
+MATCH_TEMPLATES = 5
+REPLAY_GAMES = {"cherry_tale": CherryTale, "dau_la": DauLa}
+# Asset directory holding each replay game's templates
+GAME_ASSETS = {"cherry_tale": "cherry_tale", "dau_la": "dau-la"}
+# Seconds between synthetic session frames; equal to the bot loop's sleep
+REPLAY_FRAME_INTERVAL = 0.1
+REPLAY_FRAMES = 8
+
+
+class _Bench:
+    """Frames and a headless bot shared by the matching benchmarks."""
+
+    def __init__(self, width: int, height: int):
+        self.paths = template_paths(MATCH_GAME)[:MATCH_TEMPLATES]
+        self.screen = synthetic_frame(width, height, self.paths + self.paths)
+        self.bot = BaseGameAutomation()
+        # Every call gets a new frame, so nothing is answered from the match memo
+        self.bot.change_detection = False
+        self.bot.roi_prior = None
+
+    def publish(self):
+        self.bot._publish_frame(self.screen)
+
+
+def bench_load_template(bench: _Bench, iterations: int) -> Dict[str, dict]:
+    paths = template_paths()
+
+    def cold():
+        template_cache.invalidate()
+        for path in paths:
+            load_template(path)
+
+    def warm():
+        for path in paths:
+            load_template(path)
+
+    return {"load_template/cold": time_call(cold, iterations, warmup=1),
+            "load_template/warm": time_call(warm, iterations)}
+
+
+def bench_find_template(bench: _Bench, iterations: int) -> Dict[str, dict]:
+    results = {}
+    for label, grayscale in (("color", False), ("gray", True)):
+        def run():
+            bench.publish()
+            for path in bench.paths:
+                bench.bot.find_template(path, threshold=0.8, use_grayscale=grayscale, debug=False, use_roi=False)
+
+        results[f"find_template/{label}"] = time_call(run, iterations)
+    return results
+
+
+def bench_find_all_templates(bench: _Bench, iterations: int) -> Dict[str, dict]:
+    def run():
+        bench.publish()
+        for path in bench.paths:
+            bench.bot.find_all_templates(path, threshold=0.8)
+
+    return {"find_all_templates/gray": time_call(run, iterations)}
+
+
+def bench_batch_match_templates(bench: _Bench, iterations: int) -> Dict[str, dict]:
+    def run():
+        bench.publish()
+        bench.bot.batch_match_templates(bench.paths, threshold=0.8, use_grayscale=True)
+
+    return {"batch_match_templates/gray": time_call(run, iterations)}
+
+
+def bench_decode(bench: _Bench, iterations: int) -> Dict[str, dict]:
+    png = cv2.imencode(".png", bench.screen)[1].tobytes()
+    raw = encode_raw_screencap(bench.screen, PIXEL_FORMAT_RGBA_8888)
+    return {
+        "decode/png": time_call(lambda: cv2.imdecode(np.frombuffer(png, np.uint8), cv2.IMREAD_COLOR), iterations),
+        "decode/raw": time_call(lambda: parse_raw_screencap(raw).to_bgr(), iterations),
+    }
+
+
+def synthesize_session(path: str, game: str, width: int, height: int, frames: int = REPLAY_FRAMES):
+    """Write a session of frames with the game's templates scattered over them."""
+    recorder = SessionRecorder(path, chunk_frames=frames, metadata={"game": game, "synthetic": True})
+    paths = template_paths(GAME_ASSETS[game])
+    start = time.time()
+    for index in range(frames):
+        image = synthetic_frame(width, height, paths, seed=index, scatter=True)
+        recorder.record_frame(Frame(index + 1, image, start + index * REPLAY_FRAME_INTERVAL))
+        # Keep the queue short so no frame is dropped
+        while recorder.get_stats()["queued"]:
+            time.sleep(0.01)
+    recorder.stop()
+
+
+def bench_replay(game: str, session_path: str, iterations: int) -> dict:
+    """process_game_actions iterations against a session, on a virtual clock.
+
+    Each iteration grabs the frame for the current session time through the
+    replay controller, publishes it and runs one pass of the game logic;
+    sleeps and waits inside it are instant. The session restarts when it ends.
+    """
+    session = SessionReader(session_path)
+    clock = VirtualClock(start=session.timestamps[0])
+    controller = ReplayController(session, clock=clock)
+    bot = REPLAY_GAMES[game](adb=controller, clock=clock)
+    bot.roi_prior = None
+
+    def iteration():
+        if controller.finished:
+            controller.rewind()
+        bot._publish_frame(bot._grab_screen(), clock.time())
+        bot.process_game_actions()
+        # Same pause as the ADBGameAutomation.start() loop
+        clock.sleep(REPLAY_FRAME_INTERVAL)
+
+    return time_call(iteration, iterations, warmup=1)
+
+
+BENCHMARKS: Dict[str, Callable[[_Bench, int], Dict[str, dict]]] = {
+    "load_template": bench_load_template,
+    "find_template": bench_find_template,
+    "find_all_templates": bench_find_all_templates,
+    "batch_match_templates": bench_batch_match_templates,
+    "decode": bench_decode,
+}
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_suite(args) -> dict:
+    selected = args.only or list(BENCHMARKS) + ["replay"]
+    debug_sink.enabled = False
+    results: Dict[str, dict] = {}
+    bench = _Bench(args.width, args.height)
+    for name, func in BENCHMARKS.items():
+        if name in selected:
+            for entry, result in func(bench, args.iterations).items():
+                results[entry] = result
+                print_entry(entry, result)
+    if "replay" in selected:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for game in args.games:
+                session_path = args.session
+                if session_path is None:
+                    session_path = os.path.join(tmp_dir, game)
+                    synthesize_session(session_path, game, args.width, args.height)
+                entry = f"replay/{game}/process_game_actions"
+                results[entry] = bench_replay(game, session_path, args.replay_iterations)
+                print_entry(entry, results[entry])
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "frame": [args.width, args.height],
+        "results": results,
+    }
+
+
+def print_entry(name: str, result: dict):
+    print(f"{name:<45} median {result['median_ms']:9.2f} ms  mean {result['mean_ms']:9.2f} ms  "
+          f"min {result['min_ms']:9.2f} ms  ({result['iterations']} runs)")
+
+
+def compare(baseline: dict, current: dict, tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """Print a median-by-median comparison; returns the regressed entries."""
+    regressions = []
+    base_results, current_results = baseline["results"], current["results"]
+    print(f"Baseline {baseline.get('revision') or '?'} ({baseline.get('created')}) vs "
+          f"current {current.get('revision') or '?'} ({current.get('created')}), tolerance {tolerance:.0%}")
+    for name in sorted(set(base_results) | set(current_results)):
+        if name not in current_results:
+            print(f"{name:<45} missing from current run")
+            continue
+        if name not in base_results:
+            print(f"{name:<45} new: {current_results[name]['median_ms']:.2f} ms")
+            continue
+        before, after = base_results[name]["median_ms"], current_results[name]["median_ms"]
+        change = after / before - 1.0 if before > 0 else 0.0
+        if change > tolerance:
+            status = "REGRESSION"
+            regressions.append(name)
+        elif change < -tolerance:
+            status = "faster"
+        else:
+            status = "ok"
+        print(f"{name:<45} {before:9.2f} -> {after:9.2f} ms  {change:+7.1%}  {status}")
+    if baseline.get("platform") != current.get("platform") or baseline.get("cpu_count") != current.get("cpu_count"):
+        print("Note: baseline was recorded on a different machine")
+    return regressions
+
+
+def _load(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Run the suite and save the results as JSON")
+    run.add_argument("--output", help=f"Results file (default: {DEFAULT_RESULTS_DIR}/<timestamp>.json)")
+    run.add_argument("--only", nargs="+", choices=list(BENCHMARKS) + ["replay"])
+    run.add_argument("--iterations", type=int, default=10)
+    run.add_argument("--replay-iterations", type=int, default=10)
+    run.add_argument("--games", nargs="+", choices=sorted(REPLAY_GAMES), default=sorted(REPLAY_GAMES))
+    run.add_argument("--session", help="Recorded session to replay (default: a synthetic one per game)")
+    run.add_argument("--width", type=int, default=1920)
+    run.add_argument("--height", type=int, default=1080)
+    run.add_argument("--compare", metavar="BASELINE", help="Compare against this baseline afterwards")
+    run.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+
+    check = commands.add_parser("compare", help="Compare two result files")
+    check.add_argument("baseline")
+    check.add_argument("current")
+    check.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                       help="Allowed slowdown of the median, as a fraction")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        regressions = compare(_load(args.baseline), _load(args.current), args.tolerance)
+    else:
+        report = run_suite(args)
+        output = args.output or os.path.join(DEFAULT_RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        directory = os.path.dirname(output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        print(f"Results written to {output}")
+        regressions = compare(_load(args.compare), report, args.tolerance) if args.compare else []
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
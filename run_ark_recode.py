@@ -21,6 +21,8 @@ def main():
     try:
         # Initialize automation
         game = ArkRecode()
+        # Live preview of template matches
+        game.debug_sink.show_window = True
         
         # Start automation
         game.start()
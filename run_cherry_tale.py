@@ -20,6 +20,8 @@ def main():
     try:
         # Initialize automation
         game = CherryTale()
+        # Live preview of template matches
+        game.debug_sink.show_window = True
         # Start automation
         game.start()
         
@@ -15,6 +15,8 @@ def main():
     try:
         # Initialize automation
         game = DauLa()
+        # Live preview of template matches
+        game.debug_sink.show_window = True
         # Start automation
         game.start()
         
@@ -0,0 +1,63 @@
+"""
+Run one game bot per device in a single process.
+
+    python run_orchestrator.py cherry_tale --serials 127.0.0.1:16384 127.0.0.1:16416
+    python run_orchestrator.py dau_la --all
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Add src directory to Python path
+src_dir = Path(__file__).parent / 'src'
+sys.path.append(str(src_dir))
+
+from src.core.adb import CAPTURE_MODE_PNG, CAPTURE_MODE_RAW
+from src.core.metrics import DEFAULT_METRICS_PORT, metrics
+from src.core.orchestrator import DeviceOrchestrator, list_device_serials
+from src.games.ark_recode import ArkRecode
+from src.games.cherry_tale.cherry_tale import CherryTale
+from src.games.dau_la.dau_la import DauLa
+from utils import log_error, log_info, log_success
+
+GAMES = {
+    "cherry_tale": CherryTale,
+    "dau_la": DauLa,
+    "ark_recode": ArkRecode,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("game", choices=sorted(GAMES))
+    devices = parser.add_mutually_exclusive_group(required=True)
+    devices.add_argument("--serials", nargs="+", help="Device serials or host:port endpoints")
+    devices.add_argument("--all", action="store_true", help="Every device attached to the ADB server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5037)
+    parser.add_argument("--capture-mode", choices=[CAPTURE_MODE_PNG, CAPTURE_MODE_RAW], default=CAPTURE_MODE_PNG)
+    parser.add_argument("--report-interval", type=float, default=30.0, help="Seconds between status lines")
+    parser.add_argument("--metrics-port", type=int, default=DEFAULT_METRICS_PORT,
+                        help="Serve Prometheus metrics on localhost (0 disables)")
+    parser.add_argument("--record", action="store_true", help="Record frames and actions of every bot under recordings/")
+    args = parser.parse_args()
+
+    serials = list_device_serials(args.host, args.port) if args.all else args.serials
+    if not serials:
+        log_error("No devices to run on")
+        return
+    log_success(f"Starting {args.game} on {len(serials)} devices")
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+    try:
+        DeviceOrchestrator(GAMES[args.game], serials, args.host, args.port, args.capture_mode,
+                           args.report_interval, args.record).run()
+    except Exception as e:
+        log_error(f"Error running orchestrator: {e}")
+    finally:
+        log_info("Automation ended")
+
+
+if __name__ == "__main__":
+    main()
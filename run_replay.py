@@ -0,0 +1,67 @@
+"""
+Replay a recorded session against a game bot, without a device.
+
+    python run_replay.py cherry_tale recordings/127.0.0.1_16384_20250101_120000
+    python run_replay.py cherry_tale recordings/127.0.0.1_16384_20250101_120000 --virtual
+    python run_replay.py dau_la recordings/emulator-5554_20250101_120000 --json report.json
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# Add src directory to Python path
+src_dir = Path(__file__).parent / 'src'
+sys.path.append(str(src_dir))
+
+from src.core.replay import ReplayHarness
+from src.games.ark_recode import ArkRecode
+from src.games.cherry_tale.cherry_tale import CherryTale
+from src.games.dau_la.dau_la import DauLa
+from utils import log_error, log_info, log_success
+
+GAMES = {
+    "cherry_tale": CherryTale,
+    "dau_la": DauLa,
+    "ark_recode": ArkRecode,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("game", choices=sorted(GAMES))
+    parser.add_argument("session", help="Session directory written by the session recorder")
+    parser.add_argument("--speed", type=float, default=1.0, help="Session seconds per wall-clock second")
+    parser.add_argument("--virtual", action="store_true",
+                        help="Run the bot on a virtual clock (sleeps and waits return instantly)")
+    parser.add_argument("--timeout", type=float, default=None, help="Stop after this many wall-clock seconds")
+    parser.add_argument("--json", help="Also write the full report to this file")
+    args = parser.parse_args()
+
+    try:
+        report = ReplayHarness(GAMES[args.game], args.session, args.speed, args.virtual).run(args.timeout)
+    except Exception as e:
+        log_error(f"Error running replay: {e}")
+        return
+    actions = report["actions"]
+    log_success(f"{report['game']}: {report['loops']} loops, {report['decisions']} decisions "
+                f"({report['decisions_per_s']:.1f}/s) over {report['session_s']:.1f}s of session ({report['speedup']:.1f}x real time)")
+    latency = report["match_latency"]
+    if latency["count"]:
+        # p95 is None when it falls in the histogram's open-ended last bucket
+        p95 = f"<= {latency['p95_ms']:g} ms" if latency["p95_ms"] is not None else "n/a"
+        log_info(f"Match latency: avg {latency['avg_ms']:.2f} ms, p95 {p95} ({latency['count']} matches)")
+    else:
+        log_info("Match latency: n/a (no template matches)")
+    log_info(f"Actions: {actions['matched']} matched, {actions['missing']} missing, {actions['extra']} extra "
+             f"(mean offset {actions['mean_offset_s']:+.2f}s)")
+    for difference in actions["differences"]:
+        log_info(f"  {difference['change']}: recorded {difference['recorded']} -> replayed {difference['replayed']}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
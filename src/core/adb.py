@@ -5,8 +5,11 @@ import os
 import subprocess
 import socket
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from utils import log_error, log_info, log_success, log_warning, log
+from .clock import Clock, real_clock
+from .discovery import EndpointCache, discover_devices
+from .metrics import CAPTURE_BYTES, CAPTURE_ERRORS, CAPTURE_SECONDS, INPUT_SECONDS
+from .shell_session import ShellSession, ShellSessionError
 
 # Key codes for ADB input
 KEYCODE_HOME = 3
@@ -16,17 +19,12 @@ KEYCODE_VOLUME_UP = 24
 KEYCODE_VOLUME_DOWN = 25
 KEYCODE_POWER = 26
 KEYCODE_ENTER = 66
+# Screen capture modes
+CAPTURE_MODE_PNG = "png"  # screencap -p, PNG encoded on the device
+CAPTURE_MODE_RAW = "raw"  # exec-out screencap, raw framebuffer
 # Generate host range from 16000 to 17000
 HOSTS_MUMU = [f"127.0.0.1:{port}" for port in range(16000, 17001)]
 
-def _is_port_open(host: str, port: int, timeout: float = 1.0) -> bool:
-    """Quickly check if a port is open"""
-    try:
-        with socket.create_connection((host, port), timeout=timeout):
-            return True
-    except (socket.timeout, socket.error):
-        return False
-
 def _setup_adb_path():
     try:
         # Get the absolute path to the binaries directory
@@ -43,14 +41,24 @@ def _setup_adb_path():
         log_error(f"Error setting up ADB path: {e}")
 
 class ADBController:
-    def __init__(self, device_id: str = None, host: str = "127.0.0.1", port: int = 5037):
+    def __init__(self, device_id: str = None, host: str = "127.0.0.1", port: int = 5037, capture_mode: str = CAPTURE_MODE_PNG,
+                 persistent_shell: bool = True, client: Optional[AdbClient] = None, device=None,
+                 clock: Optional[Clock] = None):
+        """``client``/``device`` let a caller that already listed the devices
+        (e.g. the multi-device orchestrator) share them and skip the lookup."""
         _setup_adb_path()  # Set up ADB path before initializing
         self.host = host
         self.port = port
-        self.device_id = device_id
-        self.client = AdbClient(host=host, port=port)
-        self.device = None
-        self.check_adb_connection()
+        self.device_id = device.serial if device is not None else device_id
+        self.capture_mode = capture_mode
+        self.clock = clock if clock is not None else real_clock
+        # Input commands go through one long-lived shell per device
+        self.persistent_shell = persistent_shell
+        self.shell_session: Optional[ShellSession] = None
+        self.client = client if client is not None else AdbClient(host=host, port=port)
+        self.device = device
+        if self.device is None:
+            self.check_adb_connection()
 
     # Check ADB connection
     def check_adb_connection(self) -> bool:
@@ -113,38 +121,56 @@ class ADBController:
                 return True
             raise
 
-    def _try_connect_to_host(self, host: str, adb_exe_path: str) -> Optional[str]:
-        """Try to connect to a single host and return device serial if successful"""
+    def _select_found_device(self, found: List[Tuple[object, Optional[str]]]) -> bool:
+        """Pick the requested device (or the first one) from discovery results."""
+        if not found:
+            return False
+        log_info(f"Total devices found: {len(found)}")
+        for device, endpoint in found:
+            log_info(f"  - Device {device.serial} on {endpoint or 'existing connection'}")
+        for device, endpoint in found:
+            if self.device_id is None or device.serial == self.device_id:
+                self.client = AdbClient(host=self.host, port=self.port)
+                self.device = device
+                self.device_id = device.serial
+                log_success(f"Successfully connected to device: {self.device_id}")
+                return True
+        return False
+
+    def check_adb_connection_with_ports(self) -> bool:
         try:
-            # First, quickly check if port is open
-            host_ip, port_str = host.split(':')
-            port = int(port_str)
-            if not _is_port_open(host_ip, port, timeout=0.5):
-                return None
-            # Try ADB connect with shorter timeout
-            result = subprocess.run(
-                [adb_exe_path, "connect", host],
-                capture_output=True,
-                text=True,
-                timeout=3  # Reduced from 10 to 3 seconds
-            )
-            # Check if devices are available
-            client = AdbClient(host=self.host, port=self.port)
-            devices = client.devices()
+            if not self._ensure_adb_server():
+                return False
+            cache = EndpointCache()
+            cached_endpoints = cache.endpoints(self.device_id)
+            if cached_endpoints:
+                log_info(f"Checking {len(cached_endpoints)} cached endpoints...")
+                found = discover_devices(cached_endpoints, self.host, self.port)
+                if self._select_found_device(found):
+                    cache.update(found)
+                    return True
+                log_warning("Cached endpoints did not match, falling back to full scan")
+
+            log_info(f"Scanning {len(HOSTS_MUMU)} ports with asyncio...")
+            found = discover_devices(HOSTS_MUMU, self.host, self.port)
+            cache.update(found)
+            if self._select_found_device(found):
+                return True
+
+            log_warning("No devices found on any port")
+            return False
             
-            if devices:
-                # Return first matching device
-                for device in devices:
-                    if device.serial == host or (self.device_id and device.serial == self.device_id):
-                        return device.serial
-                # If no specific match, return first device
-                return devices[0].serial
-                        
         except Exception as e:
-            log_error(f"Lỗi khi thử kết nối với {host}: {e}")
-        return None
+            log_error(f"Lỗi khi thử kết nối: {e}")
+            return False
 
-    def check_adb_connection_with_ports(self) -> bool:
+    def _ensure_adb_server(self) -> bool:
+        """Make sure an ADB server is listening, starting the bundled one if needed."""
+        try:
+            with socket.create_connection((self.host, self.port), timeout=1.0):
+                return True
+        except OSError:
+            pass
         # Lấy đường dẫn tới file thực thi ADB
         current_dir = os.path.dirname(os.path.abspath(__file__))
         root_dir = os.path.dirname(os.path.dirname(current_dir))
@@ -154,51 +180,10 @@ class ADBController:
             log_error(f"Không tìm thấy file ADB tại: {adb_exe_path}")
             return False
         try:
-            log_info(f"Scanning {len(HOSTS_MUMU)} ports with parallel threading...")
-            
-            found_devices = []  # Store all found devices
-            
-            # Use ThreadPoolExecutor for parallel scanning
-            with ThreadPoolExecutor(max_workers=30) as executor:  # Limit concurrent connections
-                # Submit all tasks
-                future_to_host = {
-                    executor.submit(self._try_connect_to_host, host, adb_exe_path): host 
-                    for host in HOSTS_MUMU
-                }
-                # Process results as they complete - but don't stop early
-                for future in as_completed(future_to_host):
-                    host = future_to_host[future]
-                    try:
-                        device_serial = future.result()
-                        if device_serial:
-                            log_success(f"Found device {device_serial} on {host}")
-                            found_devices.append((device_serial, host))
-                    except Exception as e:
-                        log_error(f"Error processing result for {host}: {e}")
-            
-            # After scanning all ports, connect to the first found device
-            if found_devices:
-                device_serial, host = found_devices[0]  # Use first found device
-                log_info(f"Total devices found: {len(found_devices)}")
-                for serial, host_addr in found_devices:
-                    log_info(f"  - Device {serial} on {host_addr}")
-                
-                # Set up connection to the first device
-                client = AdbClient(host=self.host, port=self.port)
-                devices = client.devices()
-                for device in devices:
-                    if device.serial == device_serial:
-                        self.client = client
-                        self.device = device
-                        self.device_id = device.serial
-                        log_success(f"Successfully connected to device: {self.device_id}")
-                        return True
-                        
-            log_warning("No devices found on any port")
-            return False
-            
+            subprocess.run([adb_exe_path, "-P", str(self.port), "start-server"], capture_output=True, text=True, timeout=10)
+            return True
         except Exception as e:
-            log_error(f"Lỗi khi thử kết nối: {e}")
+            log_error(f"Error starting ADB server: {e}")
             return False
 
     # Get screen size
@@ -211,11 +196,43 @@ class ADBController:
             log_error(f"Error getting screen size: {e}")
             return (0, 0)
 
+    def _run_input(self, *commands: str, action: str = "input"):
+        """Run input commands, pipelined on the persistent shell when possible."""
+        with INPUT_SECONDS.time(self.device_id or "unknown", action):
+            self._send_input(commands)
+
+    def _send_input(self, commands):
+        if self.persistent_shell:
+            if self.shell_session is None or self.shell_session.device is not self.device:
+                if self.shell_session is not None:
+                    self.shell_session.close()
+                self.shell_session = ShellSession(self.device)
+            try:
+                self.shell_session.start()
+            except Exception as e:
+                log_warning(f"Persistent shell unavailable, using one-shot shell: {e}")
+            else:
+                try:
+                    self.shell_session.run_many(commands)
+                    return
+                except ShellSessionError as e:
+                    if e.sent:
+                        # The input may have run without its ack; sending it again could repeat it
+                        raise
+                    log_warning(f"Persistent shell failed before sending, using one-shot shell: {e}")
+        for command in commands:
+            self.device.shell(command)
+
+    def get_input_stats(self) -> dict:
+        """Round-trip timing of input commands sent through the persistent shell."""
+        if self.shell_session is None:
+            return {}
+        return self.shell_session.get_stats()
+
     def tap(self, x: int, y: int, duration: float = 0.1, tap_count: int = 1) -> bool:
         try:
-            for i in range(tap_count):
-                self.device.shell(f"input touchscreen tap {x} {y}")
-            time.sleep(duration)
+            self._run_input(*[f"input touchscreen tap {x} {y}"] * tap_count, action="tap")
+            self.clock.sleep(duration)
             return True
         except Exception as e:
             log_error(f"Error tapping at ({x}, {y}): {e}")
@@ -224,7 +241,7 @@ class ADBController:
     def swipe(self, x1: int, y1: int, x2: int, y2: int, duration: int = 300) -> bool:
         """Swipe from one point to another."""
         try:
-            self.device.shell(f"input touchscreen swipe {x1} {y1} {x2} {y2} {duration}")
+            self._run_input(f"input touchscreen swipe {x1} {y1} {x2} {y2} {duration}", action="swipe")
             return True
         except Exception as e:
             log_error(f"Error swiping: {e}")
@@ -232,7 +249,7 @@ class ADBController:
 
     def drag(self, x1: int, y1: int, x2: int, y2: int, duration: int = 300) -> bool:
         try:
-            self.device.shell(f"input swipe {x1} {y1} {x2} {y2} {duration}")
+            self._run_input(f"input swipe {x1} {y1} {x2} {y2} {duration}", action="drag")
             return True
         except Exception as e:
             log_error(f"Error dragging: {e}")
@@ -241,7 +258,7 @@ class ADBController:
     def send_text(self, text: str) -> bool:
         """Send text input to the device."""
         try:
-            self.device.shell(f"input text '{text}'")
+            self._run_input(f"input text '{text}'", action="text")
             return True
         except Exception as e:
             log_error(f"Error sending text: {e}")
@@ -250,7 +267,7 @@ class ADBController:
     def press_key(self, keycode: int) -> bool:
         """Press a key using its keycode."""
         try:
-            self.device.shell(f"input keyevent {keycode}")
+            self._run_input(f"input keyevent {keycode}", action="key")
             return True
         except Exception as e:
             log_error(f"Error pressing key {keycode}: {e}")
@@ -264,9 +281,34 @@ class ADBController:
         """Press the home button."""
         return self.press_key(KEYCODE_HOME)
 
+    def _record_capture(self, mode: str, start_time: float, payload: Optional[bytes]):
+        device = self.device_id or "unknown"
+        CAPTURE_SECONDS.observe(time.perf_counter() - start_time, device, mode)
+        if payload:
+            CAPTURE_BYTES.inc(device, mode, amount=len(payload))
+        else:
+            CAPTURE_ERRORS.inc(device)
+
     def capture_screen_raw(self) -> Optional[bytes]:
+        start_time = time.perf_counter()
         try:
-            return self.device.screencap()
+            payload = self.device.screencap()
         except Exception as e:
             log_error(f"Error capturing screen: {e}")
-            return None
\ No newline at end of file
+            payload = None
+        self._record_capture(CAPTURE_MODE_PNG, start_time, payload)
+        return payload
+
+    def capture_screen_framebuffer(self) -> Optional[bytes]:
+        """Pull the raw framebuffer (header + pixels) without PNG encoding."""
+        start_time = time.perf_counter()
+        try:
+            conn = self.device.create_connection()
+            with conn:
+                conn.send("exec:screencap")
+                payload = conn.read_all()
+        except Exception as e:
+            log_error(f"Error capturing framebuffer: {e}")
+            payload = None
+        self._record_capture(CAPTURE_MODE_RAW, start_time, payload)
+        return payload
@@ -1,21 +1,26 @@
 import cv2
-import keyboard
 import numpy as np
-import time
 import asyncio
 import threading
+import zlib
 from typing import Tuple, Optional
 from ppadb.client import Client as AdbClient
 from utils import log_error, log_info, log_success, log_warning
-from .base_auto import BaseGameAutomation
-from .adb import ADBController
+from .base_auto import BaseGameAutomation, keyboard
+from .clock import Clock
+from .adb import ADBController, CAPTURE_MODE_PNG, CAPTURE_MODE_RAW, KEYCODE_BACK, KEYCODE_HOME
+from .framebuffer import parse_raw_screencap
+from .metrics import DECODE_SECONDS, FRAMES, metrics
+from .template_cache import template_cache
 
 class ADBGameAutomation(BaseGameAutomation):
-    def __init__(self, config_file: Optional[str] = None, device_id: str = None, host: str = "127.0.0.1", port: int = 5037):
+    def __init__(self, config_file: Optional[str] = None, device_id: str = None, host: str = "127.0.0.1", port: int = 5037,
+                 capture_mode: str = CAPTURE_MODE_PNG, adb: Optional[ADBController] = None, clock: Optional[Clock] = None):
         # Initialize with None window_title since we don't need window handling for ADB
-        super().__init__(window_title=None, config_file=config_file)
-        # Initialize ADB controller
-        self.adb = ADBController(device_id=device_id, host=host, port=port)
+        super().__init__(window_title=None, config_file=config_file, clock=clock)
+        # Initialize ADB controller (or use one prepared by the caller)
+        self.adb = adb if adb is not None else ADBController(device_id=device_id, host=host, port=port,
+                                                             capture_mode=capture_mode, clock=self.clock)
         self.window_handle = 1  # Dummy value to prevent None checks
         self.monitor = {"top": 0, "left": 0, "width": 0, "height": 0}  # Will be updated with device screen size
         width, height = self.adb.get_screen_size()
@@ -25,42 +30,98 @@ class ADBGameAutomation(BaseGameAutomation):
         
         # Override continuous capture settings for ADB
         self.capture_interval = 0.1  # Capture every 0.5 seconds for ADB
+        # Key polled by start() to stop; None when something else controls the bot
+        self.quit_key: Optional[str] = 'q'
+        # Run state and loop throughput, reported by the orchestrator
+        self.status = "idle"
+        self.loop_count = 0
+        self.last_error: Optional[str] = None
+        # Byte-identical screencap payloads are neither decoded nor published
+        self.skip_identical_payloads = True
+        self._last_payload_key: Optional[Tuple[int, int]] = None
+        self.decoded_frames = 0
+        self.skipped_frames = 0
     
+    def metrics_device(self) -> str:
+        return self.adb.device_id or "unknown"
+
+    def default_frame_bus_name(self) -> str:
+        serial = self.adb.device_id or "device"
+        return "frames_" + "".join(c if c.isalnum() else "_" for c in serial)
+
+    def _capture_payload(self) -> Optional[bytes]:
+        """Raw screencap bytes (PNG or framebuffer, depending on the capture mode)."""
+        if self.adb.capture_mode == CAPTURE_MODE_RAW:
+            return self.adb.capture_screen_framebuffer()
+        return self.adb.capture_screen_raw()
+
+    def _decode_payload(self, payload: bytes) -> Optional[np.ndarray]:
+        if self.adb.capture_mode == CAPTURE_MODE_RAW:
+            framebuffer = parse_raw_screencap(payload)
+            if framebuffer is None:
+                return None
+            return framebuffer.to_bgr()
+        nparr = np.frombuffer(payload, np.uint8)
+        return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+    def _grab_screen(self) -> Optional[np.ndarray]:
+        """Capture one BGR frame using the controller's capture mode."""
+        payload = self._capture_payload()
+        if not payload:
+            return None
+        return self._decode_payload(payload)
+
+    def _is_repeat_payload(self, payload: bytes) -> bool:
+        """True when the payload matches the previous one (length + CRC32)."""
+        key = (len(payload), zlib.crc32(payload))
+        repeat = key == self._last_payload_key
+        self._last_payload_key = key
+        return repeat
+
     def _continuous_capture_worker(self):
-        log_info("Starting continuous ADB screen capture thread")
+        log_info(f"Starting continuous ADB screen capture thread ({self.adb.capture_mode} mode)")
+        self._last_payload_key = None
         while self.capture_running:
             try:
-                result = self.adb.capture_screen_raw()
-                if result:
-                    nparr = np.frombuffer(result, np.uint8)
-                    screen = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                    if screen is not None:
-                        # Update latest screen with thread safety
-                        with self.screen_lock:
-                            self.latest_screen = screen
+                capture_time = self.clock.time()
+                payload = self._capture_payload()
+                if payload:
+                    device = self.metrics_device()
+                    if self.skip_identical_payloads and self._is_repeat_payload(payload) and self.latest_frame is not None:
+                        self.skipped_frames += 1
+                        FRAMES.inc(device, "skipped")
+                        # The screen is unchanged as of this capture
+                        self._confirm_frame(capture_time)
+                    else:
+                        with DECODE_SECONDS.time(device):
+                            screen = self._decode_payload(payload)
+                        if screen is None:
+                            self._last_payload_key = None
+                            FRAMES.inc(device, "failed")
+                        else:
+                            self.decoded_frames += 1
+                            FRAMES.inc(device, "decoded")
+                            # Update latest screen with thread safety
+                            self._publish_frame(screen, capture_time)
                         
-                time.sleep(self.capture_interval)
+                self._wait_capture_interval()
             except Exception as e:
                 log_error(f"Error in continuous ADB capture: {e}")
-                time.sleep(self.capture_interval)
+                self.clock.sleep(self.capture_interval)
         log_info("Continuous ADB screen capture thread stopped")
 
     def find_window(self) -> bool:
         return True
 
     def capture_screen(self) -> Optional[np.ndarray]:
-        """Get screen - either latest from continuous capture or capture new one."""
+        """Get screen - either latest from continuous capture (read-only) or capture new one."""
         if self.capture_running:
-            return self.get_latest_screen()
+            frame = self.get_latest_frame()
+            return frame.image if frame is not None else None
         else:
             # Fallback to direct capture if continuous capture is disabled
             try:
-                result = self.adb.capture_screen_raw()
-                if not result:
-                    log_warning("Empty screencap result")
-                    return None
-                nparr = np.frombuffer(result, np.uint8)
-                image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+                image = self._grab_screen()
                 if image is None:
                     log_error("Failed to decode screenshot")
                     return None
@@ -73,10 +134,45 @@ class ADBGameAutomation(BaseGameAutomation):
     
     # Tap gesture
     def tap(self, x: int, y: int, duration: float = 0.1, tap_count: int = 1) -> bool:
+        self.mark_action("tap", x=x, y=y, tap_count=tap_count)
         return self.adb.tap(x, y, duration, tap_count)
         
+    def tap_and_verify(self, x: int, y: int, appear: Optional[str] = None, disappear: Optional[str] = None,
+                       region: Optional[Tuple[int, int, int, int]] = None, timeout: float = 3.0,
+                       threshold: float = 0.8, retries: int = 0) -> bool:
+        """Tap and return as soon as the screen reacts, instead of sleeping.
+
+        The reaction is ``appear`` showing up, ``disappear`` going away, a
+        pixel change in ``region`` (x0, y0, x1, y1), or - with none given -
+        any screen change. Re-taps up to ``retries`` times on timeout.
+        """
+        for attempt in range(retries + 1):
+            reference = self.get_latest_frame()
+            if not self.tap(x, y, duration=0):
+                return False
+            tap_time = self.last_action_time
+            if self.wait_for_reaction(tap_time, reference, appear, disappear, region, timeout, threshold):
+                return True
+            log_warning(f"No reaction to tap at ({x}, {y}) within {timeout:.1f}s (attempt {attempt + 1}/{retries + 1})")
+        return False
+
+    def find_and_tap_verify(self, template_name: str, expect: Optional[str] = None, timeout: float = 3.0,
+                            threshold: float = 0.8, retries: int = 0) -> bool:
+        """find_and_tap, then wait until ``expect`` appears (or, without it,
+        until the tapped template disappears)."""
+        result = self.find_template(template_name, threshold=threshold)
+        if not result:
+            return False
+        x, y, confidence = result
+        start_time = self.clock.time()
+        verified = self.tap_and_verify(x, y, appear=expect, disappear=None if expect else template_name,
+                                       timeout=timeout, threshold=threshold, retries=retries)
+        if verified:
+            log_success(f"[TAP VERIFY] - [{x}, {y}] - [{template_name.replace(self.templates_dir, '').replace('/', '')}] - [confidence: {confidence:.2f}, reaction: {self.clock.time() - start_time:.2f}s]")
+        return verified
+
     def find_and_tap(self, template_name: str, log: str = "", threshold = 0.8, tap_count: int = 1) -> bool:
-        start_time = time.time()
+        start_time = self.clock.time()
         template = self.load_template(template_name)
         if template is None:
             log_error(f"Failed to load template {template_name}")
@@ -85,16 +181,16 @@ class ADBGameAutomation(BaseGameAutomation):
         result = self.find_template(template_name, threshold=threshold)
         if result:
             x, y, confidence = result
-            tap_start = time.time()
+            tap_start = self.clock.time()
             if self.tap(x, y, tap_count = tap_count):
-                tap_time = time.time() - tap_start
-                total_time = time.time() - start_time
+                tap_time = self.clock.time() - tap_start
+                total_time = self.clock.time() - start_time
                 log_success(f"[FIND TAP] - [{x}, {y}] - [{template_name.replace(self.templates_dir, '').replace('/', '')}] - [confidence: {confidence:.2f}, tap: {tap_time:.2f}s, total: {total_time:.2f}s]")
                 return True
         return False
     
     def find_and_tap_position(self, template_name: str, x: int, y: int, log: str = "", threshold = 0.9) -> bool:
-        start_time = time.time()
+        start_time = self.clock.time()
         # If no template specified, just tap at coordinates
         if not template_name:
             if self.tap(x, y):
@@ -112,20 +208,20 @@ class ADBGameAutomation(BaseGameAutomation):
         result = self.find_template(template_name, threshold=threshold)
         if result:
             if self.tap(x, y):
-                total_time = time.time() - start_time
+                total_time = self.clock.time() - start_time
                 log_success(f"[FIND TAP POSITION] - [{x}, {y}] - [{template_name.replace(self.templates_dir, '').replace('/', '')}] - [confidence: {result[2]:.2f}, total: {total_time:.2f}s]")
                 return True
                 
-        total_time = time.time() - start_time
+        total_time = self.clock.time() - start_time
         return False
     
     def find_and_tap_position_with_offset(self, template_name: str, offset: Tuple[int, int] = (0, 0),  threshold = 0.6,) -> bool:
-        start_time = time.time()
+        start_time = self.clock.time()
         result = self.find_template(template_name, threshold=threshold)
         if result:
             x, y, confidence = result
             if self.tap(x + offset[0], y + offset[1]):
-                total_time = time.time() - start_time
+                total_time = self.clock.time() - start_time
                 return True
         return False
 
@@ -142,14 +238,17 @@ class ADBGameAutomation(BaseGameAutomation):
 
     # Send text gesture
     def send_text(self, text: str) -> bool:
+        self.mark_action("text", text=text)
         return self.adb.send_text(text)
 
     # Press key gesture
     def press_key(self, keycode: int) -> bool:
+        self.mark_action("key", keycode=keycode)
         return self.adb.press_key(keycode)
     
     # Swipe gesture
     def swipe(self, x1: int, y1: int, x2: int, y2: int, duration: int = 300) -> bool:
+        self.mark_action("swipe", x1=x1, y1=y1, x2=x2, y2=y2, duration=duration)
         return self.adb.swipe(x1, y1, x2, y2, duration)
  
     def swipe_up(self,x: int, y: int, duration: int = 300) -> bool:
@@ -163,54 +262,52 @@ class ADBGameAutomation(BaseGameAutomation):
 
     # Drag gesture
     def drag(self, x1: int, y1: int, x2: int, y2: int, duration: int = 300) -> bool:
+        self.mark_action("drag", x1=x1, y1=y1, x2=x2, y2=y2, duration=duration)
         return self.adb.drag(x1, y1, x2, y2, duration)
     
     # Common gestures
     def go_back(self) -> bool:
         """Press back button"""
+        self.mark_action("key", keycode=KEYCODE_BACK)
         return self.adb.go_back()
         
     def go_home(self) -> bool:
         """Press home button"""
+        self.mark_action("key", keycode=KEYCODE_HOME)
         return self.adb.go_home()
 
-    def load_template(self, template_path: str, grayscale: bool = False) -> Optional[np.ndarray]:
-        try:
-            if grayscale:
-                template = cv2.imread(template_path, cv2.IMREAD_GRAYSCALE)
-            else:
-                template = cv2.imread(template_path, cv2.IMREAD_COLOR)
-                
-            if template is None:
-                log_error(f"Could not load template {template_path}")
-                return None
-            
-            template = template.astype(np.uint8)
-            return template
-            
-        except Exception as e:
-            log_error(f"Error loading template {template_path}: {e}")
-            return None
-
     def get_performance_info(self) -> dict:
         return {
-            "capture_interval": self.capture_interval
+            "capture_interval": self.capture_interval,
+            "capture_mode": self.adb.capture_mode,
+            "frame_seq": self.frame_seq,
+            "unchanged_frames": self.unchanged_frames,
+            "capture_requests": self.capture_requests,
+            "decoded_frames": self.decoded_frames,
+            "skipped_frames": self.skipped_frames,
+            "match_cache_hits": self.match_cache_hits,
+            "match_cache_misses": self.match_cache_misses,
+            "template_cache": template_cache.get_stats(),
+            "input_shell": self.adb.get_input_stats(),
+            "debug_sink": self.debug_sink.get_stats(),
+            "roi_prior": self.roi_prior.get_stats() if self.roi_prior is not None else {},
+            "frame_bus": self.frame_bus.get_stats() if self.frame_bus is not None else {},
+            "recorder": self.recorder.get_stats() if self.recorder is not None else {},
+            "metrics": metrics.snapshot(),
         }
 
-    def batch_find_templates(self, template_names: list, threshold: float = 0.9) -> dict:
-        results = {}
-        
-        for template_name in template_names:
-            result = self.find_template(template_name, threshold=threshold)
-            if result:
-                results[template_name] = result
-        
-        return results
+    def batch_find_templates(self, template_names: list, threshold: float = 0.9, use_grayscale: bool = False) -> dict:
+        """Match all templates against one frame in parallel; returns only the found ones.
+
+        Use batch_match_templates for misses and per-template timings.
+        """
+        return self.batch_match_templates(template_names, threshold, use_grayscale).found()
 
     def wait_for_template(self, template_name: str, timeout: float = 30.0, interval: float = 0.5, 
                          threshold: float = 0.9, log_progress: bool = True) -> Optional[Tuple[int, int, float]]:
-        start_time = time.time()
-        attempts = 0
+        """Wait until the template appears. Wakes on every captured frame and
+        matches each new screen once; ``interval`` is kept for compatibility."""
+        start_time = self.clock.time()
         
         if log_progress:
             log_info(f"Waiting for template: {template_name} (timeout: {timeout}s, threshold: {threshold})")
@@ -220,38 +317,37 @@ class ADBGameAutomation(BaseGameAutomation):
         if template is None:
             log_error(f"Failed to load template for waiting: {template_name}")
             return None
-            
-        while time.time() - start_time < timeout:
-            attempts += 1
-            
-            # Check for template using continuous capture
-            result = self.find_template(template_name, threshold=threshold)
-            
-            if result:
-                elapsed_time = time.time() - start_time
-                x, y, confidence = result
-                if log_progress:
-                    log_info(f"Template found after {elapsed_time:.2f}s ({attempts} attempts): {template_name} at ({x}, {y}) with confidence {confidence:.3f}")
-                return result
-            
+
+        next_progress = 5.0
+
+        def check(frame):
+            nonlocal next_progress
+            result = self._find_template_on_frame(frame, template_name, threshold, False, True)
             # Log progress every 5 seconds
-            elapsed_time = time.time() - start_time
-            if log_progress and elapsed_time > 0 and int(elapsed_time) % 5 == 0 and elapsed_time - int(elapsed_time) < interval:
+            elapsed_time = self.clock.time() - start_time
+            if not result and log_progress and elapsed_time >= next_progress:
                 log_info(f"Still waiting for {template_name}... ({elapsed_time:.1f}s elapsed)")
-            
-            # Wait before next attempt
-            time.sleep(interval)
+                next_progress = (int(elapsed_time) // 5 + 1) * 5.0
+            return result
+
+        result, attempts = self._wait_for_frames(check, timeout, kind="wait_for_template")
+        elapsed_time = self.clock.time() - start_time
+        if result:
+            x, y, confidence = result
+            if log_progress:
+                log_info(f"Template found after {elapsed_time:.2f}s ({attempts} attempts): {template_name} at ({x}, {y}) with confidence {confidence:.3f}")
+            return result
         
         # Timeout reached
-        elapsed_time = time.time() - start_time
         if log_progress:
             log_warning(f"Timeout waiting for template: {template_name} after {elapsed_time:.2f}s ({attempts} attempts)")
         return None
 
     def wait_for_any_template(self, template_names: list, timeout: float = 30.0, interval: float = 0.5,
                              threshold: float = 0.9, log_progress: bool = True) -> Optional[Tuple[str, int, int, float]]:
-        start_time = time.time()
-        attempts = 0
+        """Wait until any of the templates appears, checking each new screen once
+        in list order; ``interval`` is kept for compatibility."""
+        start_time = self.clock.time()
         
         if log_progress:
             log_info(f"Waiting for any of {len(template_names)} templates (timeout: {timeout}s)")
@@ -268,31 +364,32 @@ class ADBGameAutomation(BaseGameAutomation):
         if not templates:
             log_error("No valid templates to wait for")
             return None
-            
-        while time.time() - start_time < timeout:
-            attempts += 1
-            
-            # Check each template using continuous capture
+
+        next_progress = 5.0
+
+        def check(frame):
+            nonlocal next_progress
             for template_name in templates.keys():
-                result = self.find_template(template_name, threshold=threshold)
-                
+                result = self._find_template_on_frame(frame, template_name, threshold, False, True)
                 if result:
-                    elapsed_time = time.time() - start_time
                     x, y, confidence = result
-                    if log_progress:
-                        log_info(f"Template found after {elapsed_time:.2f}s ({attempts} attempts): {template_name} at ({x}, {y}) with confidence {confidence:.3f}")
                     return (template_name, x, y, confidence)
-            
             # Log progress every 5 seconds
-            elapsed_time = time.time() - start_time
-            if log_progress and elapsed_time > 0 and int(elapsed_time) % 5 == 0 and elapsed_time - int(elapsed_time) < interval:
+            elapsed_time = self.clock.time() - start_time
+            if log_progress and elapsed_time >= next_progress:
                 log_info(f"Still waiting for any template... ({elapsed_time:.1f}s elapsed)")
-            
-            # Wait before next attempt
-            time.sleep(interval)
+                next_progress = (int(elapsed_time) // 5 + 1) * 5.0
+            return None
+
+        result, attempts = self._wait_for_frames(check, timeout, kind="wait_for_any_template")
+        elapsed_time = self.clock.time() - start_time
+        if result:
+            template_name, x, y, confidence = result
+            if log_progress:
+                log_info(f"Template found after {elapsed_time:.2f}s ({attempts} attempts): {template_name} at ({x}, {y}) with confidence {confidence:.3f}")
+            return result
         
         # Timeout reached
-        elapsed_time = time.time() - start_time
         if log_progress:
             log_warning(f"Timeout waiting for any template after {elapsed_time:.2f}s ({attempts} attempts)")
         return None
@@ -351,11 +448,13 @@ class ADBGameAutomation(BaseGameAutomation):
         raise Exception("ADB connection failed on all tried ports")
     
     def start(self):
+        self.status = "connecting"
         if not self.adb.device:
             self.adb.check_adb_connection()
             
         if not self.adb.device:
             log_error("Failed to connect to ADB device")
+            self.status = "disconnected"
             return
             
         # Get and update screen size
@@ -364,7 +463,7 @@ class ADBGameAutomation(BaseGameAutomation):
             self.monitor["width"] = width
             self.monitor["height"] = height
             
-        log_info("Starting ADB automation... Press 'q' to quit")
+        log_info(f"Starting ADB automation on {self.adb.device_id}..." + (f" Press '{self.quit_key}' to quit" if self.quit_key else ""))
         self.running = True
         
         self.start_continuous_capture()
@@ -375,14 +474,15 @@ class ADBGameAutomation(BaseGameAutomation):
         try:
             while self.running:
                 try:
-                    if keyboard.is_pressed('q'):
+                    if self.quit_key and keyboard is not None and keyboard.is_pressed(self.quit_key):
                         log_info("Stopping automation...")
                         self.running = False
                         break
 
                     # Verify device is still connected
                     if not self.adb.device:
-                        current_time = time.time()
+                        self.status = "reconnecting"
+                        current_time = self.clock.time()
                         if current_time - last_error_time >= error_cooldown:
                             log_warning("ADB device disconnected, attempting to reconnect...")
                             try:
@@ -390,25 +490,30 @@ class ADBGameAutomation(BaseGameAutomation):
                             except Exception as e:
                                 log_error(f"Failed to reconnect: {e}")
                             last_error_time = current_time
-                        time.sleep(1)
+                        self.clock.sleep(1)
                         continue
                     
+                    self.status = "running"
                     # Check if process_game_actions is a coroutine
                     if asyncio.iscoroutinefunction(self.process_game_actions):
                         asyncio.run(self.process_game_actions())
                     else:
                         self.process_game_actions()
+                    self.loop_count += 1
                     
                     # Small delay to prevent excessive CPU usage
-                    time.sleep(0.1)
+                    self.clock.sleep(0.1)
                         
                 except Exception as e:
-                    current_time = time.time()
+                    self.status = "error"
+                    self.last_error = str(e)
+                    current_time = self.clock.time()
                     if current_time - last_error_time >= error_cooldown:
                         log_error(f"Error in ADB automation loop: {e}")
                         last_error_time = current_time
-                    time.sleep(0.5)
+                    self.clock.sleep(0.5)
         finally:
             # Stop continuous capture when exiting
             if self.capture_running:
                 self.stop_continuous_capture()
+            self.status = "stopped"
@@ -1,15 +1,11 @@
 from colorama import Fore
 import cv2
 import numpy as np
-import pyautogui
 import time
-import keyboard
 from mss import mss
 import sys
 import logging
-from typing import Tuple, Optional, Dict, Any, List
-import win32gui
-import win32con
+from typing import Tuple, Optional, Dict, Any, List, Callable
 import ctypes
 from ctypes import wintypes
 from datetime import datetime
@@ -18,6 +14,31 @@ import threading
 
 import yaml
 from utils import log_with_time, log_error, log_warning, log_success, log_info
+from .clock import Clock, real_clock
+from .debug_sink import debug_sink
+from .frame import DEFAULT_CHANGE_THRESHOLD, Frame, frame_signature, signature_distance
+from .frame_bus import DEFAULT_FRAME_BUS_SLOTS, FrameBus
+from .matching import (DEFAULT_PYRAMID_SCALE, PYRAMID_THRESHOLD_SLACK, BatchMatchResult, extract_matches,
+                       get_match_executor, match_template, match_template_pyramid)
+from .metrics import FRAMES, MATCH_SECONDS, MATCHES, WAIT_SECONDS
+from .roi_prior import roi_prior_index
+from .session_recorder import DEFAULT_RECORDINGS_DIR, SessionRecorder
+from .template_bank import TemplateBank
+from .template_cache import load_template, template_cache
+
+# Window capture and mouse input are Windows-only; the ADB and replay
+# backends run without them (e.g. on a headless Linux box)
+try:
+    import pyautogui
+    import win32gui
+    import win32con
+except Exception:
+    pyautogui = win32gui = win32con = None
+# Only used for the quit-key poll; needs root on Linux
+try:
+    import keyboard
+except Exception:
+    keyboard = None
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -25,9 +46,13 @@ logging.basicConfig(
     datefmt='%Y-%m-%d %H:%M:%S'
 )
 
+# Sentinel for "no memoized result" (None is a valid cached miss)
+_NO_MATCH_CACHED = object()
+
 class BaseGameAutomation:
-    def __init__(self, window_title: str = None, config_file: str = None):
-        self.sct = mss()
+    def __init__(self, window_title: str = None, config_file: str = None, clock: Optional[Clock] = None):
+        # Screen grabber, created on first window capture (needs a display)
+        self._sct = None
         self.running = False
         self.window_title = window_title
         self.window_handle = None
@@ -37,55 +62,336 @@ class BaseGameAutomation:
         self.last_window_check = 0
         self.window_check_interval = 1.0  # Check window position every 1 second
         self.config_file = config_file
+        # Source of time for sleeps, waits and timestamps; a VirtualClock runs faster than real time
+        self.clock = clock if clock is not None else real_clock
         
         # Continuous screen capture
         self.capture_interval = 0.5  # Capture every 0.5 seconds
         self.latest_screen = None
+        self.latest_frame: Optional[Frame] = None
         self.screen_lock = threading.Lock()
         self.capture_thread = None
         self.capture_running = False
+        # Sequence number of latest_screen, bumped for every published frame
+        self.frame_seq = 0
+        # Frames whose signature matches the previous one are marked unchanged
+        # and reuse its match results; threshold is the largest cell difference
+        self.change_detection = True
+        self.change_threshold = DEFAULT_CHANGE_THRESHOLD
+        self.unchanged_frames = 0
+        # Notified whenever a frame is published
+        self.frame_condition = self.clock.condition(self.screen_lock)
+        # Capture start time up to which latest_frame is known to be current
+        # (an identical re-capture confirms it without publishing a new frame)
+        self.frame_confirmed_at = 0.0
+        # Dispatch time of the last input action (tap, swipe, key, ...)
+        self.last_action_time = 0.0
+        # Set to make the capture worker grab the next frame without waiting
+        self._capture_wakeup = self.clock.event()
+        self.capture_requests = 0
+        # Match results memoized for the current screen content only
+        self._match_cache: Dict[tuple, Any] = {}
+        self._match_cache_seq = 0
+        self._match_cache_lock = threading.Lock()
+        self.match_cache_hits = 0
+        self.match_cache_misses = 0
+        # Async debug-image writer (shared); disable or sample it in production
+        self.debug_sink = debug_sink
+        # Coarse-to-fine matching: per-template scale, used when find_template's pyramid is None
+        self.pyramid_templates: Dict[str, float] = {}
+        # Learned search ROIs from past hit locations (shared); None disables
+        self.roi_prior = roi_prior_index
+        # Shared matching pool used by batch matching (and available to game code)
+        self.executor = get_match_executor()
+        # Session recorder (frames + actions), started on demand
+        self.recorder: Optional[SessionRecorder] = None
+        # Optional shared-memory ring other processes can read frames from
+        self.frame_bus: Optional[FrameBus] = None
+        self.frame_bus_slots = DEFAULT_FRAME_BUS_SLOTS
+        self._frame_bus_name: Optional[str] = None
         
+    def _publish_frame(self, screen: np.ndarray, timestamp: Optional[float] = None):
+        """Make a freshly captured frame the latest one and drop stale matches.
+
+        ``timestamp`` is when the capture started, so a frame is only treated
+        as showing the result of an action dispatched before that moment.
+        """
+        signature = frame_signature(screen) if self.change_detection else None
+        with self.screen_lock:
+            self.frame_seq += 1
+            frame = Frame(self.frame_seq, screen, self.clock.time() if timestamp is None else timestamp)
+            previous = self.latest_frame
+            if (signature is not None and previous is not None and previous.signature is not None
+                    and previous.shape == frame.shape
+                    and signature_distance(previous.signature, signature) <= self.change_threshold):
+                # Keep the signature of the first frame of the run so slow drift still registers
+                frame.signature = previous.signature
+                frame.changed = False
+                frame.content_seq = previous.content_seq
+                self.unchanged_frames += 1
+            else:
+                frame.signature = signature
+            self.latest_frame = frame
+            self.latest_screen = frame.image
+            self.frame_confirmed_at = max(self.frame_confirmed_at, frame.timestamp)
+            self.frame_condition.notify_all()
+        with self._match_cache_lock:
+            if frame.content_seq > self._match_cache_seq:
+                self._match_cache = {}
+                self._match_cache_seq = frame.content_seq
+        if self._frame_bus_name is not None:
+            self._publish_to_bus(frame)
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.record_frame(frame)
+
+    def start_recording(self, path: Optional[str] = None, **metadata) -> SessionRecorder:
+        """Record every published frame and input action until stop_recording()."""
+        if self.recorder is not None:
+            return self.recorder
+        if path is None:
+            device = "".join(c if c.isalnum() or c in ".-" else "_" for c in self.metrics_device())
+            path = os.path.join(DEFAULT_RECORDINGS_DIR, f"{device}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        metadata.setdefault("game", self.__class__.__name__)
+        metadata.setdefault("device", self.metrics_device())
+        self.recorder = SessionRecorder(path, metadata=metadata)
+        frame = self.latest_frame
+        if frame is not None:
+            self.recorder.record_frame(frame)
+        return self.recorder
+
+    def stop_recording(self):
+        recorder, self.recorder = self.recorder, None
+        if recorder is not None:
+            recorder.stop()
+
+    def enable_frame_bus(self, name: Optional[str] = None, slots: int = DEFAULT_FRAME_BUS_SLOTS) -> str:
+        """Also publish every frame into a shared-memory ring that other
+        processes can attach to with FrameBusReader(name). Returns the name."""
+        self._frame_bus_name = name or self.default_frame_bus_name()
+        self.frame_bus_slots = slots
+        return self._frame_bus_name
+
+    def disable_frame_bus(self):
+        self._frame_bus_name = None
+        if self.frame_bus is not None:
+            self.frame_bus.close()
+            self.frame_bus = None
+
+    def metrics_device(self) -> str:
+        """Device label used for this bot's metrics."""
+        return "local"
+
+    def default_frame_bus_name(self) -> str:
+        return f"frames_{os.getpid()}"
+
+    def _publish_to_bus(self, frame: Frame):
+        # The ring is sized on the first frame; a larger frame (rotation) recreates it
+        if self.frame_bus is None or frame.image.nbytes > self.frame_bus.slot_capacity:
+            if self.frame_bus is not None:
+                self.frame_bus.close()
+            try:
+                self.frame_bus = FrameBus(self._frame_bus_name, frame.image.nbytes, self.frame_bus_slots)
+                log_info(f"Publishing frames to shared memory '{self._frame_bus_name}'")
+            except Exception as e:
+                log_error(f"Could not create frame bus {self._frame_bus_name}: {e}")
+                self._frame_bus_name = None
+                self.frame_bus = None
+                return
+        self.frame_bus.publish(frame.seq, frame.image, frame.timestamp)
+
+    def _confirm_frame(self, timestamp: float):
+        """Record that a capture started at ``timestamp`` still shows latest_frame."""
+        with self.frame_condition:
+            self.frame_confirmed_at = max(self.frame_confirmed_at, timestamp)
+            self.frame_condition.notify_all()
+
+    def _wait_capture_interval(self):
+        """Sleep between captures, returning early when a capture is requested."""
+        if self._capture_wakeup.wait(self.capture_interval):
+            self._capture_wakeup.clear()
+
+    def request_capture(self):
+        """Ask the capture worker to grab a frame now instead of after its interval."""
+        self.capture_requests += 1
+        self._capture_wakeup.set()
+
+    def mark_action(self, action: str = "action", **details) -> float:
+        """Record the dispatch time of an input action (and log it to the
+        session recorder, if one is running) and return it."""
+        self.last_action_time = self.clock.time()
+        recorder = self.recorder
+        if recorder is not None:
+            try:
+                recorder.record_action(action, self.last_action_time, **details)
+            except Exception as e:
+                log_error(f"Error recording action: {e}")
+        return self.last_action_time
+
+    def get_frame(self, after: Optional[float] = None, timeout: float = 5.0, trigger: bool = True) -> Optional[Frame]:
+        """The latest frame, or - with ``after`` - the first frame captured at or
+        after that instant, blocking up to ``timeout``. ``trigger`` requests an
+        immediate capture (or captures directly when continuous capture is off).
+        Use ``get_frame(after=self.last_action_time)`` to see the screen after
+        your last action."""
+        if after is None:
+            return self.latest_frame
+        if self.frame_confirmed_at < after and trigger:
+            if self.capture_running:
+                self.request_capture()
+            else:
+                capture_time = self.clock.time()
+                screen = self.capture_screen()
+                if screen is not None:
+                    self._publish_frame(screen, capture_time)
+        deadline = self.clock.time() + timeout
+        with self.frame_condition:
+            while self.latest_frame is None or self.frame_confirmed_at < after:
+                remaining = deadline - self.clock.time()
+                if remaining <= 0:
+                    return None
+                self.frame_condition.wait(remaining)
+            return self.latest_frame
+
+    def wait_for_frame(self, after_seq: int = 0, timeout: float = 10.0) -> Optional[Frame]:
+        """Block until a frame newer than ``after_seq`` is published; None on timeout."""
+        deadline = self.clock.time() + timeout
+        with self.frame_condition:
+            while True:
+                frame = self.latest_frame
+                if frame is not None and frame.seq > after_seq:
+                    return frame
+                remaining = deadline - self.clock.time()
+                if remaining <= 0:
+                    return None
+                self.frame_condition.wait(remaining)
+
+    def wait_for_change(self, timeout: float = 10.0, since: Optional[Frame] = None) -> Optional[Frame]:
+        """Block until the screen content differs from ``since`` (default: the
+        latest frame). Returns the new frame, or None on timeout."""
+        deadline = self.clock.time() + timeout
+        reference = since if since is not None else self.latest_frame
+        content_seq = reference.content_seq if reference is not None else 0
+        frame = reference
+        while frame is None or frame.content_seq <= content_seq:
+            frame = self.wait_for_frame(frame.seq if frame is not None else 0, deadline - self.clock.time())
+            if frame is None:
+                return None
+        return frame
+
+    def _wait_for_frames(self, check: Callable[[Frame], Any], timeout: float,
+                         after: Optional[float] = None, kind: str = "wait") -> Tuple[Any, int]:
+        """Run ``check`` once per new screen content until it returns something
+        truthy or the timeout expires. Frames captured before ``after`` are
+        ignored. Returns (result or None, attempts); the duration is recorded
+        under ``kind`` in the wait_seconds metric."""
+        start_time = time.perf_counter()
+        result, attempts = self._wait_for_frames_loop(check, timeout, after)
+        WAIT_SECONDS.observe(time.perf_counter() - start_time, kind, "found" if result else "timeout")
+        return result, attempts
+
+    def _wait_for_frames_loop(self, check: Callable[[Frame], Any], timeout: float,
+                              after: Optional[float]) -> Tuple[Any, int]:
+        deadline = self.clock.time() + timeout
+        checked_content = None
+        attempts = 0
+        frame = self.latest_frame
+        while True:
+            if (frame is not None and frame.content_seq != checked_content
+                    and (after is None or frame.timestamp >= after)):
+                checked_content = frame.content_seq
+                attempts += 1
+                result = check(frame)
+                if result:
+                    return result, attempts
+            remaining = deadline - self.clock.time()
+            if remaining <= 0:
+                return None, attempts
+            frame = self.wait_for_frame(frame.seq if frame is not None else 0, remaining)
+            if frame is None:
+                return None, attempts
+
+    def set_pyramid_mode(self, template_path: str, enabled: bool = True, scale: float = DEFAULT_PYRAMID_SCALE):
+        """Match this template coarse-to-fine by default (see find_template's pyramid)."""
+        if enabled:
+            self.pyramid_templates[template_path] = scale
+        else:
+            self.pyramid_templates.pop(template_path, None)
+
+    def _get_cached_match(self, seq: int, key: tuple):
+        """Return the memoized result for key on content seq, or _NO_MATCH_CACHED."""
+        with self._match_cache_lock:
+            if seq == self._match_cache_seq and key in self._match_cache:
+                self.match_cache_hits += 1
+                return self._match_cache[key]
+            self.match_cache_misses += 1
+            return _NO_MATCH_CACHED
+
+    def _store_match(self, seq: int, key: tuple, result):
+        with self._match_cache_lock:
+            if seq > self._match_cache_seq:
+                self._match_cache = {}
+                self._match_cache_seq = seq
+            if seq == self._match_cache_seq:
+                self._match_cache[key] = result
+
     def _continuous_capture_worker(self):
         log_info("Starting continuous screen capture thread")
         while self.capture_running:
             try:
                 if self.monitor:
                     # Capture screen
+                    capture_time = self.clock.time()
                     screenshot = self.sct.grab(self.monitor)
                     # Convert from BGRA to BGR format
                     img = np.array(screenshot)
                     screen = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
                     
                     # Update latest screen with thread safety
-                    with self.screen_lock:
-                        self.latest_screen = screen
+                    self._publish_frame(screen, capture_time)
+                    FRAMES.inc(self.metrics_device(), "decoded")
                         
-                time.sleep(self.capture_interval)
+                self._wait_capture_interval()
             except Exception as e:
                 log_error(f"Error in continuous capture: {e}")
-                time.sleep(self.capture_interval)
+                self.clock.sleep(self.capture_interval)
         log_info("Continuous screen capture thread stopped")
     
     def start_continuous_capture(self):
         """Start the continuous screen capture thread."""
         if not self.capture_running:
             self.capture_running = True
-            self.capture_thread = threading.Thread(target=self._continuous_capture_worker, daemon=True)
+            self.capture_thread = self.clock.thread(self._continuous_capture_worker, name="capture")
             self.capture_thread.start()
             log_info("Continuous screen capture started")
     
+    @property
+    def sct(self):
+        if self._sct is None:
+            self._sct = mss()
+        return self._sct
+
     def stop_continuous_capture(self):
         """Stop the continuous screen capture thread."""
         if self.capture_running:
             self.capture_running = False
+            # Wake the worker from its capture interval so it exits promptly
+            self._capture_wakeup.set()
             if self.capture_thread and self.capture_thread.is_alive():
                 self.capture_thread.join(timeout=2.0)
             log_info("Continuous screen capture stopped")
+        if self.roi_prior is not None:
+            self.roi_prior.save()
+        self.stop_recording()
    
     def get_latest_screen(self) -> Optional[np.ndarray]:
-        """Get the latest captured screen with thread safety."""
-        with self.screen_lock:
-            return self.latest_screen.copy() if self.latest_screen is not None else None
+        """Get a writable copy of the latest captured screen."""
+        frame = self.latest_frame
+        return frame.copy() if frame is not None else None
+
+    def get_latest_frame(self) -> Optional[Frame]:
+        """Get the latest captured frame as a read-only handle (no copy)."""
+        return self.latest_frame
 
     def find_window(self) -> bool:
         """Find the game window by title without focusing it."""
@@ -93,7 +399,7 @@ class BaseGameAutomation:
             log_error("No window title specified")
             return False
             
-        current_time = time.time()
+        current_time = self.clock.time()
         if current_time - self.last_window_check < self.window_check_interval:
             return bool(self.window_handle)
             
@@ -125,27 +431,14 @@ class BaseGameAutomation:
             return False
 
     def load_template(self, template_path: str, grayscale: bool = False) -> Optional[np.ndarray]:
-        try:
-            if grayscale:
-                template = cv2.imread(template_path, cv2.IMREAD_GRAYSCALE)
-            else:
-                template = cv2.imread(template_path, cv2.IMREAD_COLOR)
-                
-            if template is None:
-                log_error(f"Could not load template {template_path}")
-                return None
-                
-            template = template.astype(np.uint8)
-            return template
-            
-        except Exception as e:
-            log_error(f"Error loading template {template_path}: {e}")
-            return None
+        """Load a template through the process-wide cache (read-only array)."""
+        return load_template(template_path, grayscale)
 
     def capture_screen(self) -> Optional[np.ndarray]:
-        """Get screen - either latest from continuous capture or capture new one."""
+        """Get screen - either latest from continuous capture (read-only) or capture new one."""
         if self.capture_running:
-            return self.get_latest_screen()
+            frame = self.get_latest_frame()
+            return frame.image if frame is not None else None
         else:
             # Fallback to direct capture if continuous capture is disabled
             if not self.monitor:
@@ -160,65 +453,134 @@ class BaseGameAutomation:
                 log_error(f"Error capturing screen: {e}")
                 return None
 
-    def find_template(self, template_path: str, threshold: float = 0.75, use_grayscale: bool = False, debug: bool = True) -> Optional[Tuple[int, int, float]]:
-        screen = self.get_latest_screen()
-        if screen is None:
+    def find_template(self, template_path: str, threshold: float = 0.75, use_grayscale: bool = False, debug: bool = True,
+                      pyramid: Optional[bool] = None, use_roi: bool = True,
+                      after: Optional[float] = None) -> Optional[Tuple[int, int, float]]:
+        """Match on the latest frame, or on the first frame captured after
+        ``after`` (e.g. ``self.last_action_time``) when given."""
+        frame = self.get_frame(after) if after is not None else self.get_latest_frame()
+        if frame is None:
             log_info("No screen available from continuous capture")
             return None
+        return self._find_template_on_frame(frame, template_path, threshold, use_grayscale, debug, pyramid, use_roi)
+
+    def _find_template_on_frame(self, frame: Frame, template_path: str, threshold: float, use_grayscale: bool, debug: bool,
+                                pyramid: Optional[bool] = None, use_roi: bool = True) -> Optional[Tuple[int, int, float]]:
+        """find_template against a given frame, memoized per frame."""
+        if pyramid is None:
+            scale = self.pyramid_templates.get(template_path)
+        else:
+            scale = self.pyramid_templates.get(template_path, DEFAULT_PYRAMID_SCALE) if pyramid else None
+        use_roi = use_roi and self.roi_prior is not None
+        cache_key = ("find_template", template_path, threshold, use_grayscale, scale, use_roi)
+        cached = self._get_cached_match(frame.content_seq, cache_key)
+        if cached is not _NO_MATCH_CACHED:
+            MATCHES.inc("find_template", "cached")
+            return cached
+        with MATCH_SECONDS.time("find_template", template_path):
+            result = self._find_template_uncached(frame, template_path, threshold, use_grayscale, debug, scale, use_roi)
+        MATCHES.inc("find_template", "hit" if result else "miss")
+        self._store_match(frame.content_seq, cache_key, result)
+        return result
+
+    def batch_match_templates(self, template_paths: List[str], threshold: float = 0.9, use_grayscale: bool = False,
+                              debug: bool = False) -> BatchMatchResult:
+        """Match several templates against one frame snapshot in parallel.
+
+        Preprocessing (grayscale) is done once for the snapshot, then the
+        matches fan out over the shared matching pool.
+        """
+        start_time = time.perf_counter()
+        frame = self.get_latest_frame()
+        batch = BatchMatchResult(frame.seq if frame is not None else 0)
+        if frame is None:
+            log_info("No screen available from continuous capture")
+            batch.results = {template_path: None for template_path in template_paths}
+            return batch
+        if use_grayscale:
+            frame.gray()
+
+        def match_one(template_path: str):
+            match_start = time.perf_counter()
+            result = self._find_template_on_frame(frame, template_path, threshold, use_grayscale, debug)
+            return template_path, result, (time.perf_counter() - match_start) * 1000.0
+
+        futures = [self.executor.submit(match_one, template_path) for template_path in template_paths]
+        for future in futures:
+            template_path, result, elapsed_ms = future.result()
+            batch.results[template_path] = result
+            batch.timings_ms[template_path] = elapsed_ms
+        batch.total_ms = (time.perf_counter() - start_time) * 1000.0
+        return batch
+
+    def match_template_bank(self, bank: TemplateBank, threshold: float = 0.8, use_grayscale: bool = True,
+                            roi: Optional[Tuple[int, int, int, int]] = None) -> List[Tuple[str, int, int, float]]:
+        """Ranked (name, x, y, confidence) assignment of a template bank on the latest frame."""
+        frame = self.get_latest_frame()
+        if frame is None:
+            log_info("No screen available from continuous capture")
+            return []
+        cache_key = ("match_template_bank", id(bank), threshold, use_grayscale, roi)
+        cached = self._get_cached_match(frame.content_seq, cache_key)
+        if cached is not _NO_MATCH_CACHED:
+            return list(cached)
+        try:
+            assignment = bank.match(frame, threshold, use_grayscale, roi)
+        except Exception as e:
+            log_error(f"Error in template bank matching: {e}")
+            return []
+        self._store_match(frame.content_seq, cache_key, tuple(assignment))
+        return assignment
+
+    def _find_template_uncached(self, frame: Frame, template_path: str, threshold: float, use_grayscale: bool, debug: bool,
+                                pyramid_scale: Optional[float] = None, use_roi: bool = False) -> Optional[Tuple[int, int, float]]:
         try:
             roi_offset_x, roi_offset_y = 0, 0
             
-            if use_grayscale:
-                # Convert screen to grayscale
-                if len(screen.shape) == 3:
-                    screen_processed = cv2.cvtColor(screen, cv2.COLOR_BGR2GRAY)
-                else:  # Already grayscale
-                    screen_processed = screen
-                    
-                template = self.load_template(template_path, grayscale=True)
-            else:
-                # Color processing - screen is already in BGR format from capture_screen()
-                screen_processed = screen.copy()  # Screen is already BGR from capture_screen()
-                template = self.load_template(template_path, grayscale=False)
+            # Grayscale conversion is done once per frame and shared
+            screen_processed = frame.gray() if use_grayscale else frame.image
+            template = self.load_template(template_path, grayscale=use_grayscale)
             
             if template is None:
                 return None
                 
             # Ensure both images have the same data type
-            screen_processed = screen_processed.astype(np.uint8)
-            template = template.astype(np.uint8)
+            screen_processed = screen_processed.astype(np.uint8, copy=False)
+            template = template.astype(np.uint8, copy=False)
+            
+            # Search the learned ROI first, fall back to the full frame on a miss
+            max_val = -1.0
+            roi = self.roi_prior.get_roi(template_path, screen_processed.shape, template.shape[:2]) if use_roi else None
+            if roi is not None:
+                x0, y0, x1, y1 = roi
+                max_val, max_loc = match_template(screen_processed[y0:y1, x0:x1], template)
+                if max_val >= threshold:
+                    roi_offset_x, roi_offset_y = x0, y0
+                    self.roi_prior.roi_hits += 1
+                else:
+                    self.roi_prior.roi_misses += 1
             
             # Perform template matching
-            result = cv2.matchTemplate(screen_processed, template, cv2.TM_CCOEFF_NORMED)
-            min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+            if max_val < threshold:
+                if use_roi:
+                    self.roi_prior.full_scans += 1
+                if pyramid_scale:
+                    max_val, max_loc = match_template_pyramid(
+                        screen_processed, template,
+                        frame.scaled(pyramid_scale, use_grayscale),
+                        template_cache.get_scaled(template_path, use_grayscale, pyramid_scale),
+                        pyramid_scale, threshold - PYRAMID_THRESHOLD_SLACK)
+                else:
+                    max_val, max_loc = match_template(screen_processed, template)
             
             if max_val >= threshold:
                 final_x = max_loc[0] + roi_offset_x
                 final_y = max_loc[1] + roi_offset_y
+                if use_roi:
+                    self.roi_prior.record_hit(template_path, screen_processed.shape, final_x, final_y)
                 
-                if debug: # debug mode
-                    # Create debug image with rectangle
-                    debug_img = screen_processed.copy()
-                    cv2.rectangle(debug_img, 
-                                (max_loc[0], max_loc[1]), 
-                                (max_loc[0] + template.shape[1], max_loc[1] + template.shape[0]), 
-                                (0, 0, 255), 2)
-                    
-                    # Add confidence text
-                    cv2.putText(debug_img, f'Conf: {max_val:.3f}' + f' {template_path}' , 
-                              (max_loc[0]-20, max_loc[1] - 10), 
-                              cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
-                    
-                    # Save debug image
-                    os.makedirs("logs/screen_processed", exist_ok=True)
-                    template_filename = os.path.basename(template_path)
-                    save_path = f"logs/screen_processed/{template_filename}"
-                    cv2.imwrite(save_path, debug_img)
-                    
-                    # Display resized image to avoid large windows
-                    display_img = cv2.resize(debug_img, (0,0), fx=0.5, fy=0.5)
-                    cv2.imshow("Template Matching Debug", display_img)
-                    cv2.waitKey(1)  # Process GUI events
+                if debug: # debug mode, rendered on the sink's writer thread
+                    self.debug_sink.submit(screen_processed, template_path, (final_x, final_y), template.shape[:2], max_val)
                     
                 return (final_x, final_y, max_val)
 
@@ -228,14 +590,48 @@ class BaseGameAutomation:
             log_error(f"Error in template matching: {e}")
         return None
 
+    def wait_for_reaction(self, since: float, reference: Optional[Frame] = None, appear: Optional[str] = None,
+                          disappear: Optional[str] = None, region: Optional[Tuple[int, int, int, int]] = None,
+                          timeout: float = 3.0, threshold: float = 0.8, region_threshold: float = 8.0) -> bool:
+        """Wait for the screen to react to an action dispatched at ``since``.
+
+        Satisfied by the first frame captured after ``since`` on which any of
+        the given conditions holds: ``appear`` is found, ``disappear`` is gone,
+        or the mean difference of ``region`` (x0, y0, x1, y1) against
+        ``reference`` exceeds ``region_threshold``. With no condition, any
+        change of screen content against ``reference`` counts.
+        """
+        if region is not None and reference is not None:
+            x0, y0, x1, y1 = region
+            reference_region = reference.gray()[y0:y1, x0:x1]
+        else:
+            reference_region = None
+
+        def check(frame: Frame) -> bool:
+            if appear and self._find_template_on_frame(frame, appear, threshold, False, False):
+                return True
+            if disappear and not self._find_template_on_frame(frame, disappear, threshold, False, False):
+                return True
+            if reference_region is not None:
+                current = frame.gray()[y0:y1, x0:x1]
+                if current.shape == reference_region.shape and \
+                        float(cv2.absdiff(current, reference_region).mean()) > region_threshold:
+                    return True
+            if not (appear or disappear or region):
+                return reference is None or frame.content_seq != reference.content_seq
+            return False
+
+        result, _ = self._wait_for_frames(check, timeout, after=since, kind="reaction")
+        return bool(result)
+
     def wait_for_template(self, template_path: str, threshold: float = 0.75, timeout: float = 10.0) -> Optional[Tuple[int, int, float]]:
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            result = self.find_template(template_path, threshold)
-            if result:
-                x, y, confidence = result
-                return (x, y, confidence)  # Return as tuple to avoid numpy array issues
-            time.sleep(0.1)
+        """Match each newly captured frame once until the template shows up."""
+        result, _ = self._wait_for_frames(
+            lambda frame: self._find_template_on_frame(frame, template_path, threshold, False, True), timeout,
+            kind="wait_for_template")
+        if result:
+            x, y, confidence = result
+            return (x, y, confidence)  # Return as tuple to avoid numpy array issues
         return None
     
     def wait_and_click(self, template_path: str, threshold: float = 0.75, timeout: float = 10.0) -> Optional[Tuple[int, int, float]]:
@@ -275,12 +671,12 @@ class BaseGameAutomation:
                     log_warning(f"Scroll point ({abs_x}, {abs_y}) is outside game window bounds")
                 
                 if attempt < retries - 1:
-                    time.sleep(0.5)  # Wait before retry
+                    self.clock.sleep(0.5)  # Wait before retry
                     
             except Exception as e:
                 log_error(f"Error scrolling at ({x}, {y}): {e}")
                 if attempt < retries - 1:
-                    time.sleep(0.5)
+                    self.clock.sleep(0.5)
         return False
 
     def click_image(self,button_path: str, threshold: float = 0.8, offset: Tuple[int, int] = (0, 0), retries: int = 1, duration: float = 0, log:str = "") -> bool:
@@ -296,7 +692,7 @@ class BaseGameAutomation:
                 self.logger.debug(f"Button {button_path} not found (attempt {attempt + 1}/{retries})")
             
             if attempt < retries - 1:
-                time.sleep(0.5)
+                self.clock.sleep(0.5)
                 
         return False
     
@@ -313,6 +709,7 @@ class BaseGameAutomation:
                     window_at_point = win32gui.WindowFromPoint((abs_x, abs_y))
                     if window_at_point == self.window_handle:
                         # Add duration parameter to click
+                        self.mark_action("click", x=x, y=y, duration=duration)
                         pyautogui.click(x=abs_x, y=abs_y, clicks=1, interval=0.0, button='left', duration=duration)
                         return True
                     else:
@@ -321,12 +718,12 @@ class BaseGameAutomation:
                     log_warning(f"Click point ({abs_x}, {abs_y}) is outside game window bounds")
                 
                 if attempt < retries - 1:
-                    time.sleep(0.5)  # Wait before retry
+                    self.clock.sleep(0.5)  # Wait before retry
                     
             except Exception as e:
                 log_error(f"Error clicking at ({x}, {y}): {e}")
                 if attempt < retries - 1:
-                    time.sleep(0.5)
+                    self.clock.sleep(0.5)
         return False
 
     def find_and_click(self, template_path: str, threshold: float = 0.8, offset: Tuple[int, int] = (0, 0), retries: int = 1, duration: float = 0, log:str = "") -> bool:
@@ -376,42 +773,42 @@ class BaseGameAutomation:
         try:
             while self.running:
                 try:
-                    if keyboard.is_pressed('q'):
+                    if keyboard is not None and keyboard.is_pressed('q'):
                         log_info("Stopping automation...")
                         self.running = False
                         break
                         
                     # Re-check window position periodically
                     if not self.find_window():
-                        current_time = time.time()
+                        current_time = self.clock.time()
                         if current_time - last_error_time >= error_cooldown:
                             log_warning("Window lost, retrying...")
                             last_error_time = current_time
-                        time.sleep(1)
+                        self.clock.sleep(1)
                         continue
                         
                     # Verify window is active
                     foreground_window = win32gui.GetForegroundWindow()
                     if foreground_window != self.window_handle:
-                        current_time = time.time()
+                        current_time = self.clock.time()
                         if current_time - last_error_time >= error_cooldown:
                             log_warning("Game window is not active, waiting...")
                             last_error_time = current_time
-                        time.sleep(1)
+                        self.clock.sleep(1)
                         continue
                         
                     # Process game actions (screen capture is now handled by background thread)
                     self.process_game_actions()
                     
                     # Small delay to prevent excessive CPU usage
-                    time.sleep(0.1)
+                    self.clock.sleep(0.1)
                         
                 except Exception as e:
-                    current_time = time.time()
+                    current_time = self.clock.time()
                     if current_time - last_error_time >= error_cooldown:
                         log_error(f"Error in main loop: {e}")
                         last_error_time = current_time
-                    time.sleep(1)
+                    self.clock.sleep(1)
         finally:
             # Stop continuous capture when exiting
             if self.capture_running:
@@ -478,9 +875,27 @@ class BaseGameAutomation:
             config = yaml.safe_load(file)
         return config
     
-    def find_all_templates(self, template_path: str, threshold: float = 0.8, use_grayscale: bool = True, debug: bool = False) -> List[Tuple[int, int, float]]:
+    def find_all_templates(self, template_path: str, threshold: float = 0.8, use_grayscale: bool = True, debug: bool = False,
+                           max_results: Optional[int] = None) -> List[Tuple[int, int, float]]:
+        frame = self.get_latest_frame()
+        if frame is None:
+            return self._find_all_templates_uncached(None, template_path, threshold, use_grayscale, debug, max_results)
+        cache_key = ("find_all_templates", template_path, threshold, use_grayscale, max_results)
+        cached = self._get_cached_match(frame.content_seq, cache_key)
+        if cached is not _NO_MATCH_CACHED:
+            MATCHES.inc("find_all_templates", "cached")
+            return list(cached)
+        # Grayscale conversion is shared with every other match on this frame
+        screen = frame.gray() if use_grayscale else frame.image
+        with MATCH_SECONDS.time("find_all_templates", template_path):
+            matches = self._find_all_templates_uncached(screen, template_path, threshold, use_grayscale, debug, max_results)
+        MATCHES.inc("find_all_templates", "hit" if matches else "miss")
+        self._store_match(frame.content_seq, cache_key, tuple(matches))
+        return matches
+
+    def _find_all_templates_uncached(self, screen: Optional[np.ndarray], template_path: str, threshold: float, use_grayscale: bool, debug: bool,
+                                     max_results: Optional[int] = None) -> List[Tuple[int, int, float]]:
         try:
-            screen = self.get_latest_screen()
             # Use consistent preprocessing logic like find_template method
             roi_offset_x, roi_offset_y = 0, 0
             
@@ -493,55 +908,23 @@ class BaseGameAutomation:
                     
                 template = self.load_template(template_path, grayscale=True)
             else:
-                # Color processing - screen is already in BGR format from capture_screen()
-                screen_processed = screen.copy()
+                # Color processing - screen is already BGR and read-only, no copy needed
+                screen_processed = screen
                 template = self.load_template(template_path, grayscale=False)
             
             if template is None:
                 return []
             
             # Ensure data types are consistent
-            screen_processed = screen_processed.astype(np.uint8)
-            template = template.astype(np.uint8)
+            screen_processed = screen_processed.astype(np.uint8, copy=False)
+            template = template.astype(np.uint8, copy=False)
             
             result = cv2.matchTemplate(screen_processed, template, cv2.TM_CCOEFF_NORMED)
             
-            # Find all locations with confidence >= threshold  
-            locations = np.where(result >= threshold)
-            matches = []
-            
-            # Filter out nearby matches (improved non-maximum suppression)
+            # Vectorized candidate extraction + non-maximum suppression
             template_h, template_w = template.shape[:2]
-            
-            # Create list of all candidates first
-            candidates = []
-            for pt in zip(*locations[::-1]):  # Switch x and y
-                x, y = pt
-                confidence = result[y, x]
-                final_x = x + roi_offset_x + template_w // 2  # Center point
-                final_y = y + roi_offset_y + template_h // 2  # Center point
-                candidates.append((final_x, final_y, confidence))
-            
-            # Sort candidates by confidence descending
-            candidates.sort(key=lambda x: x[2], reverse=True)
-            
-            # Non-maximum suppression with larger threshold
-            min_distance = max(template_w, template_h) * 0.8  # Increased from 0.5 to 0.8
-            
-            for candidate in candidates:
-                x, y, confidence = candidate
-                
-                # Check if there's any nearby match (avoid duplicates)
-                is_duplicate = False
-                for existing_match in matches:
-                    existing_x, existing_y, _ = existing_match
-                    distance = np.sqrt((x - existing_x)**2 + (y - existing_y)**2)
-                    if distance < min_distance:
-                        is_duplicate = True
-                        break
-                
-                if not is_duplicate:
-                    matches.append((x, y, confidence))
+            matches = extract_matches(result, threshold, template_w, template_h,
+                                      (roi_offset_x, roi_offset_y), max_results)
             
             # Logging based on debug parameter
             if debug or len(matches) > 10:
@@ -0,0 +1,206 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+_INFINITY = float("inf")
+
+
+class Clock:
+    """Real (wall-clock) time, the default for every bot.
+
+    Bot code reads the time and sleeps through its clock, and creates the
+    events, conditions and threads it waits on through it, so a
+    VirtualClock can be swapped in for replays and simulations.
+    """
+
+    virtual = False
+
+    def time(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def condition(self, lock=None) -> threading.Condition:
+        return threading.Condition(lock)
+
+    def event(self) -> threading.Event:
+        return threading.Event()
+
+    def thread(self, target: Callable, name: Optional[str] = None, daemon: bool = True) -> threading.Thread:
+        """A thread whose sleeps and waits take part in this clock's time."""
+        return threading.Thread(target=target, name=name, daemon=daemon)
+
+
+# Shared by every bot that is not given a clock
+real_clock = Clock()
+
+
+class _Waiter:
+    __slots__ = ("notified",)
+
+    def __init__(self):
+        self.notified = False
+
+
+class VirtualClock(Clock):
+    """Simulated time that advances instantly instead of sleeping.
+
+    Threads created with thread() are participants. A participant that
+    sleeps or waits blocks until its deadline; once every participant is
+    blocked, time jumps straight to the earliest deadline. Computation takes
+    no simulated time, so a long session runs as fast as the CPU allows.
+    Other threads may use the clock too; they count as participants only
+    while they are blocked on it.
+    """
+
+    virtual = True
+
+    def __init__(self, start: float = 0.0):
+        self._now = start
+        self._cond = threading.Condition()
+        self._participants = 0
+        self._blocked: Dict[_Waiter, float] = {}
+        self._local = threading.local()
+        self.advances = 0
+
+    def time(self) -> float:
+        return self._now
+
+    def sleep(self, seconds: float):
+        self._wait(self._enter(_Waiter(), seconds))
+
+    def condition(self, lock=None) -> "_VirtualCondition":
+        return _VirtualCondition(self, lock)
+
+    def event(self) -> "_VirtualEvent":
+        return _VirtualEvent(self)
+
+    def thread(self, target: Callable, name: Optional[str] = None, daemon: bool = True) -> threading.Thread:
+        # Counted from creation, so time cannot run ahead before the thread starts
+        with self._cond:
+            self._participants += 1
+            self._advance()
+
+        def run():
+            self._local.participant = True
+            try:
+                target()
+            finally:
+                self._local.participant = False
+                with self._cond:
+                    self._participants -= 1
+                    self._advance()
+
+        return threading.Thread(target=run, name=name, daemon=daemon)
+
+    def _enter(self, waiter: _Waiter, timeout: Optional[float]) -> _Waiter:
+        """Register ``waiter`` as blocked until now + ``timeout`` (None: until woken)."""
+        if timeout is not None and timeout <= 0:
+            return waiter
+        with self._cond:
+            if not getattr(self._local, "participant", False):
+                self._participants += 1
+                self._local.guest = True
+            self._blocked[waiter] = _INFINITY if timeout is None else self._now + timeout
+            self._advance()
+        return waiter
+
+    def _wait(self, waiter: _Waiter) -> bool:
+        """Block until ``waiter`` is woken or its deadline passes; True if woken."""
+        with self._cond:
+            while waiter in self._blocked:
+                self._cond.wait()
+            if getattr(self._local, "guest", False):
+                self._local.guest = False
+                self._participants -= 1
+                # The remaining participants may all be blocked already
+                self._advance()
+            return waiter.notified
+
+    def _wake(self, waiters: List[_Waiter]):
+        with self._cond:
+            for waiter in waiters:
+                if self._blocked.pop(waiter, None) is not None:
+                    waiter.notified = True
+            self._cond.notify_all()
+
+    def _advance(self):
+        """Caller holds _cond. Jump to the earliest deadline once everyone is blocked."""
+        if not self._blocked or len(self._blocked) < self._participants:
+            return
+        deadline = min(self._blocked.values())
+        if deadline == _INFINITY:
+            return
+        self._now = max(self._now, deadline)
+        self.advances += 1
+        for waiter, waiter_deadline in list(self._blocked.items()):
+            if waiter_deadline <= self._now:
+                del self._blocked[waiter]
+        self._cond.notify_all()
+
+
+class _VirtualCondition:
+    """threading.Condition whose wait timeouts run on a VirtualClock."""
+
+    def __init__(self, clock: VirtualClock, lock=None):
+        self._clock = clock
+        self._lock = lock if lock is not None else threading.RLock()
+        self._waiters: List[_Waiter] = []
+        self.acquire = self._lock.acquire
+        self.release = self._lock.release
+
+    def __enter__(self):
+        return self._lock.__enter__()
+
+    def __exit__(self, *args):
+        return self._lock.__exit__(*args)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        # Registered before the lock is released, so a notify cannot slip in between
+        waiter = self._clock._enter(_Waiter(), timeout)
+        self._waiters.append(waiter)
+        self._lock.release()
+        try:
+            return self._clock._wait(waiter)
+        finally:
+            self._lock.acquire()
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def notify_all(self):
+        waiters, self._waiters = self._waiters, []
+        self._clock._wake(waiters)
+
+    notifyAll = notify_all
+
+    def notify(self, n: int = 1):
+        waiters, self._waiters = self._waiters[:n], self._waiters[n:]
+        self._clock._wake(waiters)
+
+
+class _VirtualEvent:
+    """threading.Event whose wait timeouts run on a VirtualClock."""
+
+    def __init__(self, clock: VirtualClock):
+        self._cond = _VirtualCondition(clock, threading.Lock())
+        self._flag = False
+
+    def is_set(self) -> bool:
+        return self._flag
+
+    def set(self):
+        with self._cond:
+            self._flag = True
+            self._cond.notify_all()
+
+    def clear(self):
+        with self._cond:
+            self._flag = False
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        with self._cond:
+            if not self._flag:
+                self._cond.wait(timeout)
+            return self._flag
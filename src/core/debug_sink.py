@@ -0,0 +1,125 @@
+import os
+import queue
+import random
+import threading
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+from utils import log_error, log_info
+
+DEFAULT_OUTPUT_DIR = os.path.join("logs", "screen_processed")
+
+
+class DebugSink:
+    """Draws, saves and shows template-match debug images on a background thread.
+
+    ``submit`` only samples and enqueues; when the bounded queue is full the
+    image is dropped so the automation thread never waits on disk or GUI.
+    Frames must not be mutated after submission (read-only frames are fine).
+    The preview window is opt-in (``show_window``, set by the desktop
+    runners) and is turned off the first time the OpenCV build can't show it.
+    """
+
+    def __init__(self, enabled: bool = True, sample_rate: float = 1.0, max_queue: int = 8,
+                 output_dir: str = DEFAULT_OUTPUT_DIR, show_window: bool = False):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.output_dir = output_dir
+        self.show_window = show_window
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        self.submitted = 0
+        self.sampled_out = 0
+        self.dropped = 0
+        self.written = 0
+
+    def submit(self, image: np.ndarray, template_path: str, top_left: Tuple[int, int],
+               template_size: Tuple[int, int], confidence: float) -> bool:
+        """Queue one match for rendering; returns False if it was skipped."""
+        if not self.enabled:
+            return False
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self.sampled_out += 1
+            return False
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((image, template_path, top_left, template_size, confidence))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.submitted += 1
+        return True
+
+    def stop(self, timeout: float = 2.0):
+        with self._thread_lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout=timeout)
+
+    def get_stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "submitted": self.submitted,
+            "sampled_out": self.sampled_out,
+            "dropped": self.dropped,
+            "written": self.written,
+            "queued": self._queue.qsize(),
+        }
+
+    def _ensure_worker(self):
+        if self._thread is not None:
+            return
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, daemon=True)
+                self._thread.start()
+                log_info("Debug sink writer thread started")
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            try:
+                self._render(*item)
+                self.written += 1
+            except Exception as e:
+                log_error(f"Error writing debug image: {e}")
+        if self.show_window:
+            cv2.destroyAllWindows()
+
+    def _render(self, image: np.ndarray, template_path: str, top_left: Tuple[int, int],
+                template_size: Tuple[int, int], confidence: float):
+        # Create debug image with rectangle
+        debug_img = image.copy()
+        x, y = top_left
+        h, w = template_size
+        cv2.rectangle(debug_img, (x, y), (x + w, y + h), (0, 0, 255), 2)
+
+        # Add confidence text
+        cv2.putText(debug_img, f'Conf: {confidence:.3f}' + f' {template_path}',
+                    (x - 20, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+
+        # Save debug image
+        os.makedirs(self.output_dir, exist_ok=True)
+        save_path = os.path.join(self.output_dir, os.path.basename(template_path))
+        cv2.imwrite(save_path, debug_img)
+
+        if self.show_window:
+            # Display resized image to avoid large windows
+            display_img = cv2.resize(debug_img, (0, 0), fx=0.5, fy=0.5)
+            try:
+                cv2.imshow("Template Matching Debug", display_img)
+                cv2.waitKey(1)  # Process GUI events
+            except cv2.error as e:
+                # Headless OpenCV build or no display; keep saving images only
+                self.show_window = False
+                log_error(f"Debug window unavailable, disabling it: {e}")
+
+
+# Shared by every automation instance in the process
+debug_sink = DebugSink()
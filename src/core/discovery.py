@@ -0,0 +1,143 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from ppadb.client import Client as AdbClient
+from utils import log_error, log_info, log_warning
+
+# Last-known-good serial -> endpoint mapping, relative to the working directory
+ENDPOINT_CACHE_PATH = os.path.join("cache", "adb_endpoints.json")
+
+
+async def _probe_port(host: str, port: int, timeout: float) -> bool:
+    """Check whether a TCP port accepts connections."""
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
+
+
+async def _adb_connect(server_host: str, server_port: int, endpoint: str, timeout: float) -> bool:
+    """Send ``host:connect:<endpoint>`` to the ADB server (same as ``adb connect``)."""
+    request = f"host:connect:{endpoint}".encode("utf-8")
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(server_host, server_port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    try:
+        writer.write(f"{len(request):04x}".encode("utf-8") + request)
+        await writer.drain()
+        status = await asyncio.wait_for(reader.readexactly(4), timeout)
+        if status != b"OKAY":
+            return False
+        length = int(await asyncio.wait_for(reader.readexactly(4), timeout), 16)
+        message = (await asyncio.wait_for(reader.readexactly(length), timeout)).decode("utf-8", "replace")
+        return "connected" in message
+    except (OSError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+        return False
+    finally:
+        writer.close()
+
+
+async def scan_endpoints(endpoints: Sequence[str], server_host: str = "127.0.0.1", server_port: int = 5037,
+                         probe_timeout: float = 0.5, connect_timeout: float = 3.0,
+                         concurrency: int = 512) -> List[str]:
+    """Probe all endpoints concurrently and ``adb connect`` the open ones."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def check(endpoint: str) -> Optional[str]:
+        host, port = endpoint.rsplit(":", 1)
+        async with semaphore:
+            if not await _probe_port(host, int(port), probe_timeout):
+                return None
+        if await _adb_connect(server_host, server_port, endpoint, connect_timeout):
+            return endpoint
+        return None
+
+    results = await asyncio.gather(*(check(endpoint) for endpoint in endpoints))
+    return [endpoint for endpoint in results if endpoint]
+
+
+def _run_coroutine(coro):
+    """asyncio.run that also works when called from inside a running loop."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
+def discover_devices(endpoints: Sequence[str], server_host: str = "127.0.0.1", server_port: int = 5037,
+                     probe_timeout: float = 0.5) -> List[Tuple[object, Optional[str]]]:
+    """Scan endpoints, then list devices with one ``host:devices`` query.
+
+    Returns ``(device, endpoint)`` pairs; endpoint is None for devices that were
+    already attached some other way (USB, another tool).
+    """
+    start_time = time.time()
+    connected = _run_coroutine(scan_endpoints(endpoints, server_host, server_port, probe_timeout=probe_timeout))
+    try:
+        devices = AdbClient(host=server_host, port=server_port).devices()
+    except Exception as e:
+        log_error(f"Error listing devices after scan: {e}")
+        return []
+    connected_set = set(connected)
+    found = [(device, device.serial if device.serial in connected_set else None) for device in devices]
+    log_info(f"Scanned {len(endpoints)} endpoints in {time.time() - start_time:.2f}s: "
+             f"{len(connected)} connected, {len(devices)} devices")
+    return found
+
+
+class EndpointCache:
+    """Persisted serial -> endpoint mapping of devices that were found before."""
+
+    def __init__(self, path: str = ENDPOINT_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = self._load()
+
+    def _load(self) -> Dict[str, dict]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            return data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            log_warning(f"Ignoring unreadable endpoint cache {self.path}: {e}")
+            return {}
+
+    def endpoints(self, serial: Optional[str] = None) -> List[str]:
+        """Cached endpoints, most recently seen first (only ``serial``'s if given)."""
+        with self._lock:
+            entries = sorted(self._entries.items(), key=lambda item: item[1].get("last_seen", 0), reverse=True)
+        return [entry["endpoint"] for cached_serial, entry in entries
+                if serial is None or cached_serial == serial]
+
+    def update(self, found: Sequence[Tuple[object, Optional[str]]]):
+        now = time.time()
+        with self._lock:
+            for device, endpoint in found:
+                if endpoint:
+                    self._entries[device.serial] = {"endpoint": endpoint, "last_seen": now}
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as file:
+                    json.dump(self._entries, file, indent=2)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                log_warning(f"Could not save endpoint cache {self.path}: {e}")
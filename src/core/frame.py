@@ -0,0 +1,74 @@
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Downsampled grid used as a cheap per-frame signature (about 30x30 px cells at 1080p)
+SIGNATURE_SIZE = (64, 36)
+# Largest per-cell mean difference (0-255) still treated as the same screen
+DEFAULT_CHANGE_THRESHOLD = 2.0
+
+
+def frame_signature(image: np.ndarray) -> np.ndarray:
+    """Grayscale cell means of the image on a SIGNATURE_SIZE grid."""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    return cv2.resize(gray, SIGNATURE_SIZE, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+def signature_distance(a: np.ndarray, b: np.ndarray) -> float:
+    """Largest cell difference, so a small button appearing still counts as a change."""
+    return float(np.abs(a - b).max())
+
+
+class Frame:
+    """Immutable handle to one captured frame.
+
+    ``image`` is a read-only view shared by every reader; the capture thread
+    publishes a new Frame instead of touching an old one, so holding a handle
+    never races with capture. Call ``copy()`` only when you need to draw on it.
+    Derived images (grayscale, downscaled) are computed once per frame.
+
+    ``content_seq`` is the seq of the first frame showing the same screen:
+    the capture worker sets it (and ``changed=False``) when the frame
+    signature matches its predecessor, so match results keyed on it carry
+    over to identical frames.
+    """
+
+    __slots__ = ("seq", "timestamp", "image", "signature", "changed", "content_seq", "_derived")
+
+    def __init__(self, seq: int, image: np.ndarray, timestamp: Optional[float] = None):
+        image.flags.writeable = False
+        self.seq = seq
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.image = image
+        self.signature: Optional[np.ndarray] = None
+        self.changed = True
+        self.content_seq = seq
+        self._derived: Dict[Hashable, Any] = {}
+
+    def derived(self, key: Hashable, build: Callable[[np.ndarray], np.ndarray]) -> np.ndarray:
+        """Return ``build(image)``, computing it only once for this frame."""
+        value = self._derived.get(key)
+        if value is None:
+            value = build(self.image)
+            value.flags.writeable = False
+            self._derived[key] = value
+        return value
+
+    def gray(self) -> np.ndarray:
+        return self.derived("gray", lambda image: cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image)
+
+    def scaled(self, scale: float, grayscale: bool = False) -> np.ndarray:
+        """The frame (or its grayscale version) resized by ``scale``."""
+        source = self.gray() if grayscale else self.image
+        return self.derived(("scaled", scale, grayscale),
+                            lambda _: cv2.resize(source, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA))
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.image.shape
+
+    def copy(self) -> np.ndarray:
+        """Writable copy of the pixels."""
+        return self.image.copy()
@@ -0,0 +1,164 @@
+import struct
+import time
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+from utils import log_warning
+
+FRAME_BUS_MAGIC = 0x53554246  # "FBUS"
+FRAME_BUS_VERSION = 1
+DEFAULT_FRAME_BUS_SLOTS = 4
+
+# magic, version, slots, slot capacity (bytes), latest seq
+_BUS_HEADER = struct.Struct("<IIIQQ")
+# seq (0 while the slot is being written), timestamp, height, width, channels
+_SLOT_HEADER = struct.Struct("<QdIII")
+_BUS_HEADER_SIZE = 64
+_SLOT_HEADER_SIZE = 32
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach to an existing block without letting this process unlink it on exit."""
+    try:
+        return shared_memory.SharedMemory(name=name, create=False, track=False)
+    except TypeError:
+        # Before Python 3.13 every attach is tracked and would be unlinked by the tracker
+        block = shared_memory.SharedMemory(name=name, create=False)
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(block._name, "shared_memory")
+        except Exception:
+            pass
+        return block
+
+
+class FrameBus:
+    """Writer side of a shared-memory ring of captured frames.
+
+    Layout: a bus header (magic, version, slot count, slot capacity, latest
+    seq) followed by ``slots`` slots, each a small header (seq, timestamp,
+    height, width, channels) plus raw uint8 pixels. A slot's seq is zeroed
+    while it is rewritten, so readers can detect torn reads.
+    """
+
+    def __init__(self, name: str, frame_bytes: int, slots: int = DEFAULT_FRAME_BUS_SLOTS):
+        self.name = name
+        self.slots = slots
+        self.slot_capacity = frame_bytes
+        self._slot_size = _SLOT_HEADER_SIZE + frame_bytes
+        size = _BUS_HEADER_SIZE + slots * self._slot_size
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left over from a crashed run; replace it
+            stale = _attach(name)
+            stale.close()
+            stale.unlink()
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self._buf = self._shm.buf
+        _BUS_HEADER.pack_into(self._buf, 0, FRAME_BUS_MAGIC, FRAME_BUS_VERSION, slots, frame_bytes, 0)
+        self.published = 0
+        self.dropped = 0
+
+    def publish(self, seq: int, image: np.ndarray, timestamp: Optional[float] = None) -> bool:
+        if image.dtype != np.uint8 or image.nbytes > self.slot_capacity:
+            self.dropped += 1
+            return False
+        height, width = image.shape[:2]
+        channels = image.shape[2] if image.ndim == 3 else 1
+        offset = _BUS_HEADER_SIZE + (seq % self.slots) * self._slot_size
+        _SLOT_HEADER.pack_into(self._buf, offset, 0, 0.0, 0, 0, 0)
+        pixels = np.ndarray(image.shape, np.uint8, self._buf, offset + _SLOT_HEADER_SIZE)
+        np.copyto(pixels, image)
+        _SLOT_HEADER.pack_into(self._buf, offset, seq, time.time() if timestamp is None else timestamp,
+                               height, width, channels)
+        struct.pack_into("<Q", self._buf, _BUS_HEADER.size - 8, seq)
+        self.published += 1
+        return True
+
+    def close(self):
+        """Detach and remove the block; attached readers keep their mapping."""
+        self._buf = None
+        self._shm.close()
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    def get_stats(self) -> dict:
+        return {
+            "name": self.name,
+            "slots": self.slots,
+            "slot_capacity": self.slot_capacity,
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+
+class FrameBusReader:
+    """Read-only view of a FrameBus from any process on the same machine."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._shm = _attach(name)
+        magic, version, self.slots, self.slot_capacity, _ = _BUS_HEADER.unpack_from(self._shm.buf, 0)
+        if magic != FRAME_BUS_MAGIC or version != FRAME_BUS_VERSION:
+            self._shm.close()
+            raise ValueError(f"{name} is not a frame bus (version {FRAME_BUS_VERSION})")
+        self._slot_size = _SLOT_HEADER_SIZE + self.slot_capacity
+
+    @property
+    def latest_seq(self) -> int:
+        return struct.unpack_from("<Q", self._shm.buf, _BUS_HEADER.size - 8)[0]
+
+    def _slot(self, seq: int) -> Optional[Tuple[float, np.ndarray]]:
+        offset = _BUS_HEADER_SIZE + (seq % self.slots) * self._slot_size
+        slot_seq, timestamp, height, width, channels = _SLOT_HEADER.unpack_from(self._shm.buf, offset)
+        if slot_seq != seq or not height:
+            return None
+        shape = (height, width, channels) if channels > 1 else (height, width)
+        image = np.ndarray(shape, np.uint8, self._shm.buf, offset + _SLOT_HEADER_SIZE)
+        image.flags.writeable = False
+        return timestamp, image
+
+    def is_current(self, seq: int) -> bool:
+        """True while the slot holding ``seq`` has not been overwritten."""
+        offset = _BUS_HEADER_SIZE + (seq % self.slots) * self._slot_size
+        return _SLOT_HEADER.unpack_from(self._shm.buf, offset)[0] == seq
+
+    def read(self, copy: bool = True, retries: int = 3) -> Optional[Tuple[int, float, np.ndarray]]:
+        """Latest (seq, timestamp, image), or None before the first frame.
+
+        With ``copy=False`` the image is a zero-copy view into shared memory
+        that the writer overwrites ``slots`` frames later; check is_current()
+        after using it.
+        """
+        for _ in range(retries):
+            seq = self.latest_seq
+            if seq == 0:
+                return None
+            slot = self._slot(seq)
+            if slot is None:
+                continue
+            timestamp, image = slot
+            if not copy:
+                return seq, timestamp, image
+            image = image.copy()
+            if self.is_current(seq):
+                return seq, timestamp, image
+        log_warning(f"Frame bus {self.name}: writer kept overwriting the slot being read")
+        return None
+
+    def wait(self, after_seq: int = 0, timeout: float = 5.0, poll: float = 0.005,
+             copy: bool = True) -> Optional[Tuple[int, float, np.ndarray]]:
+        """Poll until a frame newer than ``after_seq`` is published."""
+        deadline = time.time() + timeout
+        while self.latest_seq <= after_seq:
+            if time.time() >= deadline:
+                return None
+            time.sleep(poll)
+        return self.read(copy)
+
+    def close(self):
+        self._shm.close()
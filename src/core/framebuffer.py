@@ -0,0 +1,85 @@
+import struct
+from typing import Optional
+
+import cv2
+import numpy as np
+
+# android.graphics.PixelFormat values reported in the screencap header
+PIXEL_FORMAT_RGBA_8888 = 1
+PIXEL_FORMAT_RGBX_8888 = 2
+PIXEL_FORMAT_RGB_888 = 3
+PIXEL_FORMAT_RGB_565 = 4
+PIXEL_FORMAT_BGRA_8888 = 5
+
+_BYTES_PER_PIXEL = {
+    PIXEL_FORMAT_RGBA_8888: 4,
+    PIXEL_FORMAT_RGBX_8888: 4,
+    PIXEL_FORMAT_RGB_888: 3,
+    PIXEL_FORMAT_RGB_565: 2,
+    PIXEL_FORMAT_BGRA_8888: 4,
+}
+
+_TO_BGR = {
+    PIXEL_FORMAT_RGBA_8888: cv2.COLOR_RGBA2BGR,
+    PIXEL_FORMAT_RGBX_8888: cv2.COLOR_RGBA2BGR,
+    PIXEL_FORMAT_RGB_888: cv2.COLOR_RGB2BGR,
+    PIXEL_FORMAT_RGB_565: cv2.COLOR_BGR5652BGR,
+    PIXEL_FORMAT_BGRA_8888: cv2.COLOR_BGRA2BGR,
+}
+
+_FROM_BGR = {
+    PIXEL_FORMAT_RGBA_8888: cv2.COLOR_BGR2RGBA,
+    PIXEL_FORMAT_RGBX_8888: cv2.COLOR_BGR2RGBA,
+    PIXEL_FORMAT_RGB_888: cv2.COLOR_BGR2RGB,
+    PIXEL_FORMAT_RGB_565: cv2.COLOR_BGR2BGR565,
+    PIXEL_FORMAT_BGRA_8888: cv2.COLOR_BGR2BGRA,
+}
+
+# Header is width, height, format (+ colorspace since Android 9)
+_HEADER_SIZES = (16, 12)
+
+
+class RawFramebuffer:
+    """Pixels of an ``exec-out screencap`` payload, viewed in place.
+
+    ``pixels`` is a read-only numpy view over the payload buffer, so no bytes
+    are copied until ``to_bgr`` converts it for template matching.
+    """
+
+    def __init__(self, width: int, height: int, pixel_format: int, pixels: np.ndarray):
+        self.width = width
+        self.height = height
+        self.pixel_format = pixel_format
+        self.pixels = pixels
+
+    def to_bgr(self) -> np.ndarray:
+        return cv2.cvtColor(self.pixels, _TO_BGR[self.pixel_format])
+
+
+def parse_raw_screencap(data) -> Optional[RawFramebuffer]:
+    """Parse the header of a raw screencap payload and wrap its pixels."""
+    if data is None or len(data) < 12:
+        return None
+    width, height, pixel_format = struct.unpack_from("<III", data, 0)
+    bpp = _BYTES_PER_PIXEL.get(pixel_format)
+    if bpp is None or width == 0 or height == 0:
+        return None
+
+    pixel_bytes = width * height * bpp
+    header_size = len(data) - pixel_bytes
+    if header_size not in _HEADER_SIZES:
+        return None
+
+    pixels = np.frombuffer(data, dtype=np.uint8, count=pixel_bytes, offset=header_size)
+    pixels = pixels.reshape(height, width, bpp)
+    pixels.flags.writeable = False
+    return RawFramebuffer(width, height, pixel_format, pixels)
+
+
+def encode_raw_screencap(image: np.ndarray, pixel_format: int = PIXEL_FORMAT_RGB_888) -> bytes:
+    """Encode a BGR image as an ``exec-out screencap`` payload in ``pixel_format``
+    (devices usually send RGBA_8888; RGB_888 is the smallest lossless one)."""
+    height, width = image.shape[:2]
+    # width, height, format, colorspace (sRGB)
+    header = struct.pack("<IIII", width, height, pixel_format, 1)
+    return header + cv2.cvtColor(image, _FROM_BGR[pixel_format]).tobytes()
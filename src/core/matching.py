@@ -0,0 +1,121 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+_match_executor: Optional[ThreadPoolExecutor] = None
+_match_executor_lock = threading.Lock()
+
+
+def get_match_executor() -> ThreadPoolExecutor:
+    """Process-wide worker pool for template matching (cv2 releases the GIL)."""
+    global _match_executor
+    if _match_executor is None:
+        with _match_executor_lock:
+            if _match_executor is None:
+                _match_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="match")
+    return _match_executor
+
+
+class BatchMatchResult:
+    """Results of matching several templates against one frame."""
+
+    def __init__(self, frame_seq: int):
+        self.frame_seq = frame_seq
+        self.results: Dict[str, Optional[Tuple[int, int, float]]] = {}
+        self.timings_ms: Dict[str, float] = {}
+        self.total_ms = 0.0
+
+    def found(self) -> Dict[str, Tuple[int, int, float]]:
+        """Only the templates that matched."""
+        return {name: result for name, result in self.results.items() if result}
+
+
+def extract_matches(result: np.ndarray, threshold: float, template_w: int, template_h: int,
+                    roi_offset: Tuple[int, int] = (0, 0), max_results: Optional[int] = None) -> List[Tuple[int, int, float]]:
+    """Turn a matchTemplate score map into center points with greedy NMS.
+
+    Candidates above threshold are ranked by confidence (ties in row-major
+    order) and a candidate is kept only if no better kept match lies within
+    ``0.8 * max(template_w, template_h)``. Each kept match removes its
+    neighbours from the candidate arrays in one vectorized step.
+    """
+    # flatnonzero + divmod is much cheaper than 2-D nonzero and keeps row-major order
+    flat = np.flatnonzero(result >= threshold)
+    if flat.size == 0:
+        return []
+    ys, xs = np.divmod(flat, result.shape[1])
+    confidences = result[ys, xs]
+    order = np.argsort(-confidences, kind="stable")
+    centers_x = xs[order] + roi_offset[0] + template_w // 2
+    centers_y = ys[order] + roi_offset[1] + template_h // 2
+    confidences = confidences[order]
+
+    min_distance = max(template_w, template_h) * 0.8
+    matches = []
+    while centers_x.size:
+        x, y = centers_x[0], centers_y[0]
+        matches.append((int(x), int(y), confidences[0]))
+        if max_results is not None and len(matches) >= max_results:
+            break
+        keep = np.sqrt((centers_x[1:] - x) ** 2 + (centers_y[1:] - y) ** 2) >= min_distance
+        centers_x = centers_x[1:][keep]
+        centers_y = centers_y[1:][keep]
+        confidences = confidences[1:][keep]
+    return matches
+
+
+# Scaled templates smaller than this are too coarse to locate reliably
+MIN_PYRAMID_TEMPLATE_SIDE = 8
+DEFAULT_PYRAMID_SCALE = 0.5
+# Coarse candidates only need to reach threshold minus this slack
+PYRAMID_THRESHOLD_SLACK = 0.15
+
+
+def match_template(screen: np.ndarray, template: np.ndarray) -> Tuple[float, Tuple[int, int]]:
+    """Full-resolution TM_CCOEFF_NORMED match; returns (max_val, top-left)."""
+    result = cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED)
+    _, max_val, _, max_loc = cv2.minMaxLoc(result)
+    return max_val, max_loc
+
+
+def match_template_pyramid(screen: np.ndarray, template: np.ndarray, scaled_screen: np.ndarray,
+                           scaled_template: np.ndarray, scale: float, coarse_threshold: float,
+                           max_candidates: int = 3) -> Tuple[float, Tuple[int, int]]:
+    """Coarse-to-fine match: locate candidates on the downscaled pair, then
+    refine each at full resolution inside a small window around it.
+
+    Falls back to a full-resolution match when the scaled template is too
+    small. Returns (-1.0, (0, 0)) when no coarse candidate passes.
+    """
+    if min(scaled_template.shape[:2]) < MIN_PYRAMID_TEMPLATE_SIDE:
+        return match_template(screen, template)
+
+    coarse = cv2.matchTemplate(scaled_screen, scaled_template, cv2.TM_CCOEFF_NORMED)
+    template_h, template_w = template.shape[:2]
+    screen_h, screen_w = screen.shape[:2]
+    # Rounding during the resize can shift the peak by about one coarse pixel
+    margin = int(np.ceil(1.0 / scale)) + 2
+    suppress = max(1, int(min(scaled_template.shape[:2]) // 2))
+
+    best_val, best_loc = -1.0, (0, 0)
+    for _ in range(max_candidates):
+        _, coarse_val, _, coarse_loc = cv2.minMaxLoc(coarse)
+        if coarse_val < coarse_threshold:
+            break
+        cx, cy = coarse_loc
+        coarse[max(0, cy - suppress):cy + suppress + 1, max(0, cx - suppress):cx + suppress + 1] = -1.0
+
+        x0 = max(0, int(round(cx / scale)) - margin)
+        y0 = max(0, int(round(cy / scale)) - margin)
+        x1 = min(screen_w, int(round(cx / scale)) + template_w + margin)
+        y1 = min(screen_h, int(round(cy / scale)) + template_h + margin)
+        if x1 - x0 < template_w or y1 - y0 < template_h:
+            continue
+        max_val, max_loc = match_template(screen[y0:y1, x0:x1], template)
+        if max_val > best_val:
+            best_val, best_loc = max_val, (max_loc[0] + x0, max_loc[1] + y0)
+    return best_val, best_loc
@@ -0,0 +1,218 @@
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Sequence, Tuple
+
+from utils import log_error, log_info
+
+# Upper bounds in seconds, from sub-millisecond matches to multi-second waits
+DEFAULT_SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DEFAULT_METRICS_PORT = 9108
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter, optionally split by label values."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {",".join(labels): value for labels, value in self._values.items()}
+
+    def render(self) -> str:
+        with self._lock:
+            items = list(self._values.items())
+        return "\n".join(f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}" for labels, value in items)
+
+
+class Histogram:
+    """Fixed-bucket histogram (cumulative on export, like Prometheus)."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_SECONDS_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, *label_values: str) -> "_Timer":
+        """Context manager observing the elapsed seconds of its block."""
+        return _Timer(self, label_values)
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            items = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        return {
+            ",".join(labels): {
+                "count": count,
+                "sum": total,
+                "avg_ms": total * 1000.0 / count if count else 0.0,
+                "buckets": dict(zip([str(bound) for bound in self.buckets] + ["+Inf"], counts)),
+            }
+            for labels, counts, total, count in items
+        }
+
+    def render(self) -> str:
+        with self._lock:
+            items = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        lines = []
+        for labels, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(list(self.buckets) + ["+Inf"], counts):
+                cumulative += bucket_count
+                le = f'le="{bound if isinstance(bound, str) else format(bound, "g")}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {count}")
+        return "\n".join(lines)
+
+
+class _Timer:
+    __slots__ = ("histogram", "label_values", "start")
+
+    def __init__(self, histogram: Histogram, label_values: Tuple[str, ...]):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.label_values)
+        return False
+
+
+class MetricsRegistry:
+    """Named counters and histograms with a Prometheus text exposition.
+
+    Recording costs a lock and a bisect, so the hot paths keep it on in
+    production. serve() exposes /metrics on localhost.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def _get_or_create(self, name: str, factory):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(name, lambda: Counter(name, help_text, label_names))
+
+    def histogram(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_SECONDS_BUCKETS) -> Histogram:
+        return self._get_or_create(name, lambda: Histogram(name, help_text, label_names, buckets))
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        blocks = []
+        for metric in metrics:
+            body = metric.render()
+            blocks.append(f"# HELP {metric.name} {metric.help_text}\n# TYPE {metric.name} {metric.kind}"
+                          + (f"\n{body}" if body else ""))
+        return "\n".join(blocks) + "\n"
+
+    def serve(self, port: int = DEFAULT_METRICS_PORT, host: str = "127.0.0.1") -> bool:
+        """Serve the text exposition at http://host:port/metrics from a daemon thread."""
+        if self._server is not None:
+            return True
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((host, port), Handler)
+        except OSError as e:
+            log_error(f"Could not start metrics endpoint on {host}:{port}: {e}")
+            return False
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        log_info(f"Metrics available at http://{host}:{self._server.server_port}/metrics")
+        return True
+
+    def stop_server(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+# Shared by every automation instance in the process
+metrics = MetricsRegistry()
+
+CAPTURE_SECONDS = metrics.histogram("adb_capture_seconds", "Screencap transfer time", ("device", "mode"))
+CAPTURE_BYTES = metrics.counter("adb_capture_bytes_total", "Screencap payload bytes received", ("device", "mode"))
+CAPTURE_ERRORS = metrics.counter("adb_capture_errors_total", "Failed screencaps", ("device",))
+DECODE_SECONDS = metrics.histogram("frame_decode_seconds", "Screencap decode/convert time", ("device",))
+FRAMES = metrics.counter("frames_total", "Captured frames by outcome (decoded, skipped, failed)", ("device", "result"))
+MATCH_SECONDS = metrics.histogram("match_seconds", "Template match latency (cache misses only)", ("kind", "template"))
+MATCHES = metrics.counter("matches_total", "Template match calls by outcome (hit, miss, cached)", ("kind", "result"))
+INPUT_SECONDS = metrics.histogram("adb_input_seconds", "Input command round trip", ("device", "action"))
+WAIT_SECONDS = metrics.histogram("wait_seconds", "Duration of wait primitives", ("kind", "result"))
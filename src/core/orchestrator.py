@@ -0,0 +1,148 @@
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Type
+
+from ppadb.client import Client as AdbClient
+from utils import log_error, log_info, log_success, log_warning
+
+from .adb import ADBController, CAPTURE_MODE_PNG
+from .adb_auto import ADBGameAutomation
+from .discovery import discover_devices
+
+
+class DeviceOrchestrator:
+    """Runs one game bot per device inside a single process.
+
+    Devices are listed once through one shared ADB client (serials of the
+    form host:port are connected first), so no bot ever falls into the
+    interactive device prompt. All bots share the process-wide template
+    cache, matching pool, ROI priors and debug sink; each keeps its own
+    capture thread and persistent input shell. Per-device status and
+    throughput are available from get_status() and logged periodically.
+    """
+
+    def __init__(self, game_class: Type[ADBGameAutomation], serials: Sequence[str], host: str = "127.0.0.1",
+                 port: int = 5037, capture_mode: str = CAPTURE_MODE_PNG, report_interval: float = 30.0,
+                 record: bool = False):
+        self.game_class = game_class
+        self.serials = list(serials)
+        self.host = host
+        self.port = port
+        self.capture_mode = capture_mode
+        self.report_interval = report_interval
+        # Record every bot's session under recordings/ (see SessionRecorder)
+        self.record = record
+        self.client = AdbClient(host=host, port=port)
+        self.bots: Dict[str, ADBGameAutomation] = {}
+        self.errors: Dict[str, str] = {}
+        self._threads: Dict[str, threading.Thread] = {}
+        self._started_at: Dict[str, float] = {}
+        self._stop_event = threading.Event()
+        self._reporter: Optional[threading.Thread] = None
+
+    def _resolve_devices(self) -> Dict[str, object]:
+        """serial -> ppadb device, from a single host:devices query."""
+        endpoints = [serial for serial in self.serials if ":" in serial]
+        if endpoints:
+            found = [device for device, _ in discover_devices(endpoints, self.host, self.port)]
+        else:
+            found = self.client.devices()
+        devices = {device.serial: device for device in found}
+        for serial in self.serials:
+            if serial not in devices:
+                self.errors[serial] = "device not found"
+                log_warning(f"Device {serial} not found on ADB server {self.host}:{self.port}")
+        return devices
+
+    def start(self):
+        devices = self._resolve_devices()
+        for serial in self.serials:
+            device = devices.get(serial)
+            if device is None:
+                continue
+            try:
+                adb = ADBController(host=self.host, port=self.port, capture_mode=self.capture_mode,
+                                    client=self.client, device=device)
+                bot = self.game_class(adb=adb)
+            except Exception as e:
+                self.errors[serial] = str(e)
+                log_error(f"Could not create {self.game_class.__name__} for {serial}: {e}")
+                continue
+            # The orchestrator stops bots itself; one keyboard poll per bot is not needed
+            bot.quit_key = None
+            if self.record:
+                bot.start_recording()
+            self.bots[serial] = bot
+            thread = threading.Thread(target=self._run_bot, args=(serial, bot), name=f"bot-{serial}", daemon=True)
+            self._threads[serial] = thread
+            self._started_at[serial] = time.time()
+            thread.start()
+        log_success(f"Started {len(self.bots)}/{len(self.serials)} {self.game_class.__name__} bots")
+        if self.report_interval > 0:
+            self._reporter = threading.Thread(target=self._report_loop, name="orchestrator-report", daemon=True)
+            self._reporter.start()
+
+    def _run_bot(self, serial: str, bot: ADBGameAutomation):
+        try:
+            bot.start()
+        except Exception as e:
+            self.errors[serial] = str(e)
+            log_error(f"Bot {serial} crashed: {e}")
+
+    def stop(self, timeout: float = 5.0):
+        self._stop_event.set()
+        for bot in self.bots.values():
+            bot.running = False
+        deadline = time.time() + timeout
+        for thread in self._threads.values():
+            thread.join(timeout=max(0.0, deadline - time.time()))
+        for bot in self.bots.values():
+            bot.stop_continuous_capture()
+        log_info("All bots stopped")
+
+    def run(self):
+        """Start every bot and block until Ctrl+C."""
+        self.start()
+        try:
+            while not self._stop_event.is_set() and any(thread.is_alive() for thread in self._threads.values()):
+                self._stop_event.wait(1.0)
+        except KeyboardInterrupt:
+            log_info("Stopping all bots...")
+        finally:
+            self.stop()
+
+    def get_status(self) -> Dict[str, dict]:
+        """Per-device state and throughput since start."""
+        now = time.time()
+        status = {}
+        for serial in self.serials:
+            bot = self.bots.get(serial)
+            if bot is None:
+                status[serial] = {"status": "failed", "error": self.errors.get(serial)}
+                continue
+            elapsed = max(now - self._started_at[serial], 1e-9)
+            status[serial] = {
+                "status": bot.status,
+                "loops": bot.loop_count,
+                "loops_per_min": bot.loop_count * 60.0 / elapsed,
+                "frames": bot.frame_seq,
+                "captures_per_s": (bot.decoded_frames + bot.skipped_frames) / elapsed,
+                "decoded_frames": bot.decoded_frames,
+                "skipped_frames": bot.skipped_frames,
+                "error": bot.last_error or self.errors.get(serial),
+            }
+        return status
+
+    def _report_loop(self):
+        while not self._stop_event.wait(self.report_interval):
+            for serial, info in self.get_status().items():
+                if info["status"] == "failed":
+                    log_warning(f"[{serial}] failed: {info['error']}")
+                else:
+                    log_info(f"[{serial}] {info['status']} - {info['loops']} loops ({info['loops_per_min']:.1f}/min), "
+                             f"{info['captures_per_s']:.1f} captures/s, decoded {info['decoded_frames']}, skipped {info['skipped_frames']}")
+
+
+def list_device_serials(host: str = "127.0.0.1", port: int = 5037) -> List[str]:
+    """Serials of every device attached to the ADB server."""
+    return [device.serial for device in AdbClient(host=host, port=port).devices()]
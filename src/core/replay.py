@@ -0,0 +1,260 @@
+import difflib
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, Type
+
+from utils import log_info, log_success, log_warning
+
+from .adb import CAPTURE_MODE_RAW, KEYCODE_BACK, KEYCODE_HOME
+from .adb_auto import ADBGameAutomation
+from .clock import Clock, VirtualClock, real_clock
+from .debug_sink import DebugSink
+from .framebuffer import encode_raw_screencap
+from .metrics import MATCH_SECONDS, MATCHES
+from .roi_prior import RoiPriorIndex
+from .session_recorder import SessionReader
+
+
+class _ReplayDevice:
+    """Placeholder for ``ADBController.device`` so connection checks pass."""
+
+    def __init__(self, serial: str):
+        self.serial = serial
+
+
+class ReplayController:
+    """Stands in for ADBController, serving a recorded session.
+
+    The screen at any moment is the last recorded frame at or before the
+    current session time, which runs from the first recorded frame at
+    ``speed`` times the speed of ``clock`` (real time by default; with a
+    VirtualClock the session plays as fast as the bot can process it).
+    Inputs are not sent anywhere; they are collected in ``actions`` (with
+    their session time) for comparison with the recorded action log.
+    """
+
+    def __init__(self, session, speed: float = 1.0, device_id: str = "replay", clock: Optional[Clock] = None):
+        self.session = session if isinstance(session, SessionReader) else SessionReader(session)
+        if not len(self.session):
+            raise ValueError(f"Session {self.session.path} has no frames")
+        self.speed = speed
+        self.clock = clock if clock is not None else real_clock
+        self.device_id = device_id
+        self.device = _ReplayDevice(device_id)
+        self.client = None
+        self.host = "replay"
+        self.port = 0
+        # Frames are handed over as raw framebuffers, like exec-out screencap
+        self.capture_mode = CAPTURE_MODE_RAW
+        self.start_time = self.session.timestamps[0]
+        last_action = self.session.actions[-1]["timestamp"] if self.session.actions else 0.0
+        self.end_time = max(self.session.timestamps[-1], last_action, self.session.meta.get("stopped", 0.0))
+        self.actions: List[dict] = []
+        self.captures = 0
+        self.frames_served = 0
+        self._payload: Optional[Tuple[int, bytes]] = None
+        self._lock = threading.Lock()
+        self._origin: Optional[float] = None
+
+    def rewind(self):
+        """Restart the session clock at the first recorded frame."""
+        self._origin = self.clock.time()
+
+    def session_time(self) -> float:
+        if self._origin is None:
+            self.rewind()
+        return self.start_time + (self.clock.time() - self._origin) * self.speed
+
+    @property
+    def finished(self) -> bool:
+        return self.session_time() >= self.end_time
+
+    def check_adb_connection(self) -> bool:
+        return True
+
+    def get_screen_size(self) -> Tuple[int, int]:
+        height, width = self.session.meta["chunks"][0]["shape"][:2]
+        return width, height
+
+    def capture_screen_framebuffer(self) -> Optional[bytes]:
+        index = self.session.frame_at(self.session_time())
+        if index is None:
+            index = 0
+        with self._lock:
+            self.captures += 1
+            if self._payload is None or self._payload[0] != index:
+                _, image = self.session.frame(index)
+                self._payload = (index, encode_raw_screencap(image))
+                self.frames_served += 1
+            return self._payload[1]
+
+    def capture_screen_raw(self) -> Optional[bytes]:
+        return self.capture_screen_framebuffer()
+
+    def _record(self, action: str, **details) -> bool:
+        with self._lock:
+            self.actions.append({"timestamp": self.session_time(), "action": action, "details": details})
+        return True
+
+    def get_input_stats(self) -> dict:
+        return {"actions": len(self.actions)}
+
+    # Same action names and details as ADBGameAutomation passes to mark_action()
+    def tap(self, x: int, y: int, duration: float = 0.1, tap_count: int = 1) -> bool:
+        return self._record("tap", x=x, y=y, tap_count=tap_count)
+
+    def swipe(self, x1: int, y1: int, x2: int, y2: int, duration: int = 300) -> bool:
+        return self._record("swipe", x1=x1, y1=y1, x2=x2, y2=y2, duration=duration)
+
+    def drag(self, x1: int, y1: int, x2: int, y2: int, duration: int = 300) -> bool:
+        return self._record("drag", x1=x1, y1=y1, x2=x2, y2=y2, duration=duration)
+
+    def send_text(self, text: str) -> bool:
+        return self._record("text", text=text)
+
+    def press_key(self, keycode: int) -> bool:
+        return self._record("key", keycode=keycode)
+
+    def go_back(self) -> bool:
+        return self.press_key(KEYCODE_BACK)
+
+    def go_home(self) -> bool:
+        return self.press_key(KEYCODE_HOME)
+
+
+def _action_key(entry: dict) -> tuple:
+    return entry["action"], tuple(sorted(entry["details"].items()))
+
+
+def compare_actions(recorded: List[dict], replayed: List[dict], max_listed: int = 10) -> dict:
+    """Align two action logs and summarize where they differ."""
+    matcher = difflib.SequenceMatcher(None, [_action_key(a) for a in recorded], [_action_key(a) for a in replayed],
+                                      autojunk=False)
+    matched = 0
+    offsets = []
+    differences = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            matched += i2 - i1
+            offsets.extend(replayed[j].get("timestamp", 0.0) - recorded[i].get("timestamp", 0.0)
+                           for i, j in zip(range(i1, i2), range(j1, j2)))
+        elif len(differences) < max_listed:
+            differences.append({"change": tag, "recorded": recorded[i1:i2], "replayed": replayed[j1:j2]})
+    return {
+        "recorded": len(recorded),
+        "replayed": len(replayed),
+        "matched": matched,
+        "missing": len(recorded) - matched,
+        "extra": len(replayed) - matched,
+        "mean_offset_s": sum(offsets) / len(offsets) if offsets else 0.0,
+        "differences": differences,
+    }
+
+
+def _match_totals() -> Tuple[int, float, Dict[str, int]]:
+    """Match-latency observations (count, seconds) and per-bucket counts, summed over labels."""
+    count, total, buckets = 0, 0.0, {}
+    for series in MATCH_SECONDS.snapshot().values():
+        count += series["count"]
+        total += series["sum"]
+        for bound, bucket_count in series["buckets"].items():
+            buckets[bound] = buckets.get(bound, 0) + bucket_count
+    return count, total, buckets
+
+
+def _match_calls() -> float:
+    return sum(MATCHES.snapshot().values())
+
+
+class ReplayHarness:
+    """Runs a game class against a recorded session and reports on it.
+
+    The game is built with ``adb=ReplayController(...)`` and otherwise runs
+    unmodified, so any ADBGameAutomation subclass works without a device.
+    With ``virtual`` the bot runs on a VirtualClock: its sleeps and waits
+    return instantly and the session is re-simulated at full CPU speed.
+    The bot gets a disabled debug sink and an in-memory ROI prior index,
+    so a replay neither writes debug images nor changes the ROI priors
+    live bots load.
+    run() returns throughput (loops and template decisions per second),
+    match latency and the diff between recorded and replayed actions.
+    """
+
+    def __init__(self, game_class: Type[ADBGameAutomation], session_path: str, speed: float = 1.0,
+                 virtual: bool = False):
+        self.game_class = game_class
+        session = SessionReader(session_path)
+        self.clock = VirtualClock(start=session.timestamps[0]) if virtual and len(session) else real_clock
+        self.controller = ReplayController(session, speed=speed, clock=self.clock)
+        self.bot: Optional[ADBGameAutomation] = None
+
+    def run(self, timeout: Optional[float] = None) -> dict:
+        """Replay until the session ends (or ``timeout`` wall seconds pass)."""
+        self.bot = bot = self.game_class(adb=self.controller, clock=self.clock)
+        bot.quit_key = None
+        bot.debug_sink = DebugSink(enabled=False, show_window=False)
+        bot.roi_prior = RoiPriorIndex(path=None)
+        match_count, match_total, match_buckets = _match_totals()
+        match_calls = _match_calls()
+
+        thread = self.clock.thread(bot.start, name="replay-bot")
+        wall_start = time.time()
+        self.controller.rewind()
+        thread.start()
+        log_info(f"Replaying {self.controller.session.path} with {self.game_class.__name__} "
+                 + ("on a virtual clock" if self.clock.virtual else f"at {self.controller.speed}x"))
+        while thread.is_alive() and not self.controller.finished:
+            if timeout is not None and time.time() - wall_start >= timeout:
+                log_warning("Replay timed out before the end of the session")
+                break
+            time.sleep(0.05)
+        bot.running = False
+        thread.join(timeout=5.0)
+        bot.stop_continuous_capture()
+        elapsed = max(time.time() - wall_start, 1e-9)
+        session_s = min(self.controller.session_time(), self.controller.end_time) - self.controller.start_time
+
+        count, total, buckets = _match_totals()
+        count -= match_count
+        total -= match_total
+        report = {
+            "game": self.game_class.__name__,
+            "session": self.controller.session.path,
+            "speed": self.controller.speed,
+            "virtual": self.clock.virtual,
+            "wall_s": elapsed,
+            "session_s": session_s,
+            "speedup": session_s / elapsed,
+            "loops": bot.loop_count,
+            "loops_per_s": bot.loop_count / elapsed,
+            # Each template lookup is one decision about what is on screen
+            "decisions": int(_match_calls() - match_calls),
+            "decisions_per_s": (_match_calls() - match_calls) / elapsed,
+            "frames_served": self.controller.frames_served,
+            "captures": self.controller.captures,
+            "match_latency": {
+                "count": count,
+                "avg_ms": total * 1000.0 / count if count else 0.0,
+                "p95_ms": _bucket_quantile({bound: buckets[bound] - match_buckets.get(bound, 0) for bound in buckets},
+                                           0.95),
+            },
+            "actions": compare_actions(self.controller.session.actions, self.controller.actions),
+            "error": bot.last_error,
+        }
+        log_success(f"Replay done: {report['decisions_per_s']:.1f} decisions/s, "
+                    f"match avg {report['match_latency']['avg_ms']:.2f} ms, "
+                    f"{report['actions']['matched']}/{report['actions']['recorded']} recorded actions reproduced")
+        return report
+
+
+def _bucket_quantile(buckets: Dict[str, int], quantile: float) -> Optional[float]:
+    """Upper bound (ms) of the histogram bucket holding ``quantile``; None if empty or past the last bound."""
+    total = sum(buckets.values())
+    if not total:
+        return None
+    seen = 0
+    for bound, count in sorted(buckets.items(), key=lambda item: float(item[0])):
+        seen += count
+        if seen >= quantile * total:
+            return None if bound == "+Inf" else float(bound) * 1000.0
+    return None
@@ -0,0 +1,177 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from utils import log_warning
+
+# Persisted hit locations, in the repository's cache directory whatever the working directory
+ROI_PRIOR_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                              "cache", "roi_priors.json")
+
+
+class RoiPriorIndex:
+    """Where each template has been found before, used as a search ROI.
+
+    For every template the bounding box of past top-left hit positions is
+    kept per frame size. Once a template has ``min_hits`` hits, find_template
+    searches that box padded by ``padding`` pixels first and only scans the
+    full frame when the ROI misses.
+
+    Once a box is established, hits farther than ``padding`` from it are
+    not merged: they are collected separately, and ``reset_after``
+    consecutive ones replace the box (the template moved). A single false
+    positive therefore cannot stretch the box, and a box that has grown
+    past ``max_area_ratio`` anyway (e.g. loaded from an older file) is
+    dropped and learned again. The index is loaded on first use and saved
+    periodically so warm starts begin with small ROIs; with ``path=None``
+    it is kept in memory only.
+    """
+
+    def __init__(self, path: Optional[str] = ROI_PRIOR_PATH, padding: int = 40, min_hits: int = 2,
+                 max_area_ratio: float = 0.5, save_interval: float = 30.0, reset_after: int = 3):
+        self.path = path
+        self.padding = padding
+        self.min_hits = min_hits
+        self.max_area_ratio = max_area_ratio
+        self.save_interval = save_interval
+        self.reset_after = reset_after
+        self._lock = threading.Lock()
+        self._loaded: Optional[Dict[str, dict]] = None
+        self._dirty = False
+        self._last_save = time.time()
+        self.roi_hits = 0
+        self.roi_misses = 0
+        self.full_scans = 0
+        self.resets = 0
+
+    @property
+    def _entries(self) -> Dict[str, dict]:
+        """Caller holds _lock. The stored boxes, read from ``path`` on first access."""
+        if self._loaded is None:
+            self._loaded = self._load()
+        return self._loaded
+
+    @staticmethod
+    def _key(template_path: str, frame_shape: Tuple[int, ...]) -> str:
+        return f"{frame_shape[1]}x{frame_shape[0]}|{template_path}"
+
+    def _load(self) -> Dict[str, dict]:
+        if self.path is None:
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            return data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            log_warning(f"Ignoring unreadable ROI prior file {self.path}: {e}")
+            return {}
+
+    def get_roi(self, template_path: str, frame_shape: Tuple[int, ...],
+                template_size: Tuple[int, int]) -> Optional[Tuple[int, int, int, int]]:
+        """Padded search box (x0, y0, x1, y1) for the template, or None for a full scan."""
+        with self._lock:
+            entry = self._entries.get(self._key(template_path, frame_shape))
+        if entry is None or entry["hits"] < self.min_hits:
+            return None
+        frame_h, frame_w = frame_shape[:2]
+        template_h, template_w = template_size
+        x0 = max(0, entry["x_min"] - self.padding)
+        y0 = max(0, entry["y_min"] - self.padding)
+        x1 = min(frame_w, entry["x_max"] + template_w + self.padding)
+        y1 = min(frame_h, entry["y_max"] + template_h + self.padding)
+        if x1 - x0 < template_w or y1 - y0 < template_h:
+            return None
+        if (x1 - x0) * (y1 - y0) > self.max_area_ratio * frame_w * frame_h:
+            # Too spread out to help; learn it again rather than full-scan for good
+            with self._lock:
+                if self._entries.get(self._key(template_path, frame_shape)) is entry:
+                    del self._entries[self._key(template_path, frame_shape)]
+                    self._dirty = True
+                    self.resets += 1
+            return None
+        return x0, y0, x1, y1
+
+    @staticmethod
+    def _extend(box: dict, x: int, y: int):
+        box["hits"] += 1
+        box["x_min"] = min(box["x_min"], x)
+        box["y_min"] = min(box["y_min"], y)
+        box["x_max"] = max(box["x_max"], x)
+        box["y_max"] = max(box["y_max"], y)
+
+    def _near(self, box: dict, x: int, y: int) -> bool:
+        return (box["x_min"] - self.padding <= x <= box["x_max"] + self.padding
+                and box["y_min"] - self.padding <= y <= box["y_max"] + self.padding)
+
+    def record_hit(self, template_path: str, frame_shape: Tuple[int, ...], x: int, y: int):
+        """Remember a top-left match position for the template."""
+        key = self._key(template_path, frame_shape)
+        x, y = int(x), int(y)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._entries[key] = {"hits": 1, "x_min": x, "y_min": y, "x_max": x, "y_max": y}
+            elif entry["hits"] < self.min_hits or self._near(entry, x, y):
+                self._extend(entry, x, y)
+                entry.pop("outliers", None)
+            else:
+                # Far from an established box: a false positive, or the template moved
+                outliers = entry.get("outliers")
+                if outliers is None:
+                    entry["outliers"] = {"hits": 1, "x_min": x, "y_min": y, "x_max": x, "y_max": y}
+                else:
+                    self._extend(outliers, x, y)
+                    if outliers["hits"] >= self.reset_after:
+                        self._entries[key] = outliers
+                        self.resets += 1
+            self._dirty = True
+            due = time.time() - self._last_save >= self.save_interval
+        if due:
+            self.save()
+
+    def forget(self, template_path: Optional[str] = None):
+        """Drop the learned ROI of one template (all frame sizes) or of all templates."""
+        with self._lock:
+            if template_path is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key.split("|", 1)[1] == template_path]:
+                    del self._entries[key]
+            self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty or self.path is None:
+                return
+            data = json.dumps(self._entries, indent=2)
+            self._dirty = False
+            self._last_save = time.time()
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                file.write(data)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            log_warning(f"Could not save ROI priors {self.path}: {e}")
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            templates = len(self._entries)
+        return {
+            "templates": templates,
+            "roi_hits": self.roi_hits,
+            "roi_misses": self.roi_misses,
+            "full_scans": self.full_scans,
+            "resets": self.resets,
+        }
+
+
+# Shared by every automation instance in the process
+roi_prior_index = RoiPriorIndex()
@@ -0,0 +1,257 @@
+import bisect
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+from utils import log_error, log_info, log_warning
+
+DEFAULT_RECORDINGS_DIR = "recordings"
+# Frames per chunk file; a 1080p chunk is about 400 MB
+DEFAULT_CHUNK_FRAMES = 64
+SESSION_FILE = "session.json"
+INDEX_FILE = "frames.jsonl"
+ACTIONS_FILE = "actions.jsonl"
+
+
+class SessionRecorder:
+    """Records what a bot saw and did into a session directory.
+
+    Layout::
+
+        session.json    metadata and the list of chunks (file, shape, frames)
+        frames.jsonl    one line per stored frame: index, seq, timestamp, chunk, slot
+        actions.jsonl   one line per input action: timestamp, action, details, frame
+        frames_NNNNN.bin  uint8 arrays of shape (chunk_frames, H, W, C)
+
+    Chunk files are plain arrays, readable with np.memmap (see SessionReader);
+    the last one is truncated to the frames actually written on stop().
+    Frames that change detection marked unchanged are not stored again.
+    Writes happen on a background thread behind a bounded queue. When the
+    disk falls behind, frames are dropped instead of slowing capture.
+    Actions wait in their own unbounded deque, so recording one never blocks
+    or fails on the input path.
+    """
+
+    def __init__(self, path: str, chunk_frames: int = DEFAULT_CHUNK_FRAMES, max_queue: int = 16,
+                 metadata: Optional[dict] = None):
+        self.path = path
+        self.chunk_frames = chunk_frames
+        os.makedirs(path, exist_ok=True)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        # (frames queued before the action, action, timestamp, details)
+        self._actions: deque = deque()
+        self._frames_queued = 0
+        self._frames_taken = 0
+        self._lock = threading.Lock()
+        self._meta = {
+            "version": 1,
+            "started": time.time(),
+            "chunk_frames": chunk_frames,
+            "chunks": [],
+            **(metadata or {}),
+        }
+        self._chunk: Optional[np.memmap] = None
+        self._chunk_used = 0
+        self._last_content_seq: Optional[int] = None
+        self.frame_count = 0
+        self.action_count = 0
+        self.dropped = 0
+        self.duplicates = 0
+        self._index_file = open(os.path.join(path, INDEX_FILE), "a", encoding="utf-8")
+        self._actions_file = open(os.path.join(path, ACTIONS_FILE), "a", encoding="utf-8")
+        self._running = True
+        self._thread = threading.Thread(target=self._worker, name="session-recorder", daemon=True)
+        self._thread.start()
+        log_info(f"Recording session to {path}")
+
+    def record_frame(self, frame) -> bool:
+        """Queue a published Frame; unchanged or dropped frames return False."""
+        if not self._running:
+            return False
+        if not frame.changed and frame.content_seq == self._last_content_seq:
+            self.duplicates += 1
+            return False
+        self._last_content_seq = frame.content_seq
+        try:
+            self._queue.put_nowait(("frame", frame))
+        except queue.Full:
+            self.dropped += 1
+            # Let the next frame of this content be stored instead
+            self._last_content_seq = None
+            return False
+        self._frames_queued += 1
+        return True
+
+    def record_action(self, action: str, timestamp: float, **details):
+        """Log an input action; never blocks. It is written after the frames
+        queued before it, so its ``frame`` is the screen the bot acted on."""
+        if not self._running:
+            return
+        self._actions.append((self._frames_queued, action, timestamp, details))
+        try:
+            # Wake the writer; with a full queue it gets there after the next frame anyway
+            self._queue.put_nowait(("action", None))
+        except queue.Full:
+            pass
+
+    def stop(self, timeout: float = 10.0):
+        if not self._running:
+            return
+        self._running = False
+        self._queue.put(None)
+        self._thread.join(timeout=timeout)
+        with self._lock:
+            try:
+                self._write_actions(final=True)
+                self._close_chunk()
+            except Exception as e:
+                log_error(f"Session recorder error: {e}")
+            finally:
+                self._index_file.close()
+                self._actions_file.close()
+            self._meta["frames"] = self.frame_count
+            self._meta["actions"] = self.action_count
+            self._meta["stopped"] = time.time()
+            self._write_meta()
+        log_info(f"Recorded {self.frame_count} frames and {self.action_count} actions to {self.path}")
+
+    def get_stats(self) -> dict:
+        return {
+            "path": self.path,
+            "frames": self.frame_count,
+            "actions": self.action_count,
+            "duplicates": self.duplicates,
+            "dropped": self.dropped,
+            "queued": self._queue.qsize(),
+            "actions_queued": len(self._actions),
+        }
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            kind, payload = item
+            try:
+                with self._lock:
+                    if kind == "frame":
+                        self._frames_taken += 1
+                        self._write_frame(payload)
+                    self._write_actions()
+            except Exception as e:
+                log_error(f"Session recorder error: {e}")
+
+    def _write_frame(self, frame):
+        image = frame.image
+        if self._chunk is None or self._chunk_used >= self.chunk_frames or self._chunk.shape[1:] != image.shape:
+            self._open_chunk(image.shape)
+        self._chunk[self._chunk_used] = image
+        entry = {"index": self.frame_count, "seq": frame.seq, "timestamp": frame.timestamp,
+                 "chunk": len(self._meta["chunks"]) - 1, "slot": self._chunk_used}
+        self._index_file.write(json.dumps(entry) + "\n")
+        self._index_file.flush()
+        self._chunk_used += 1
+        self._meta["chunks"][-1]["frames"] = self._chunk_used
+        self.frame_count += 1
+
+    def _write_actions(self, final: bool = False):
+        """Write the queued actions whose preceding frames have been taken (all, when ``final``)."""
+        written = 0
+        while self._actions and (final or self._actions[0][0] <= self._frames_taken):
+            _, action, timestamp, details = self._actions.popleft()
+            entry = {"timestamp": timestamp, "action": action, "details": details, "frame": self.frame_count - 1}
+            self._actions_file.write(json.dumps(entry) + "\n")
+            written += 1
+        if written:
+            self._actions_file.flush()
+            self.action_count += written
+
+    def _open_chunk(self, shape: Tuple[int, ...]):
+        self._close_chunk()
+        name = f"frames_{len(self._meta['chunks']):05d}.bin"
+        self._chunk = np.memmap(os.path.join(self.path, name), dtype=np.uint8, mode="w+",
+                                shape=(self.chunk_frames,) + tuple(shape))
+        self._chunk_used = 0
+        self._meta["chunks"].append({"file": name, "shape": list(shape), "frames": 0})
+        self._write_meta()
+
+    def _close_chunk(self):
+        if self._chunk is None:
+            return
+        chunk, self._chunk = self._chunk, None
+        chunk_path, frame_bytes = chunk.filename, int(np.prod(chunk.shape[1:]))
+        chunk.flush()
+        # Unmap before truncating; Windows cannot resize a mapped file
+        del chunk
+        if self._chunk_used < self.chunk_frames:
+            # Drop the preallocated slots that were never filled
+            try:
+                os.truncate(chunk_path, self._chunk_used * frame_bytes)
+            except OSError as e:
+                log_error(f"Could not truncate {chunk_path}: {e}")
+        self._index_file.flush()
+        self._write_meta()
+
+    def _write_meta(self):
+        tmp_path = os.path.join(self.path, f"{SESSION_FILE}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self._meta, file, indent=2)
+        os.replace(tmp_path, os.path.join(self.path, SESSION_FILE))
+
+
+class SessionReader:
+    """Memory-mapped, read-only access to a recorded session."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, SESSION_FILE), "r", encoding="utf-8") as file:
+            self.meta = json.load(file)
+        self._chunks = [self._map_chunk(chunk) for chunk in self.meta["chunks"]]
+        self.index: List[dict] = self._read_lines(INDEX_FILE)
+        self.actions: List[dict] = self._read_lines(ACTIONS_FILE)
+        self.timestamps = [entry["timestamp"] for entry in self.index]
+
+    def _map_chunk(self, chunk: dict) -> Optional[np.memmap]:
+        # Sized from the file: the last chunk is truncated on stop(), but not
+        # if the recorder was killed, in which case it still has every slot
+        chunk_path = os.path.join(self.path, chunk["file"])
+        shape = tuple(chunk["shape"])
+        frames = os.path.getsize(chunk_path) // int(np.prod(shape))
+        if not frames:
+            return None
+        return np.memmap(chunk_path, dtype=np.uint8, mode="r", shape=(frames,) + shape)
+
+    def _read_lines(self, name: str) -> List[dict]:
+        entries = []
+        try:
+            with open(os.path.join(self.path, name), "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        log_warning(f"Skipping truncated line in {name}")
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def frame(self, index: int) -> Tuple[float, np.ndarray]:
+        """(timestamp, image) of stored frame ``index``; the image is a read-only view."""
+        entry = self.index[index]
+        return entry["timestamp"], self._chunks[entry["chunk"]][entry["slot"]]
+
+    def frame_at(self, timestamp: float) -> Optional[int]:
+        """Index of the last frame captured at or before ``timestamp``."""
+        position = bisect.bisect_right(self.timestamps, timestamp)
+        return position - 1 if position else None
+
+    def frames(self) -> Iterator[Tuple[float, np.ndarray]]:
+        for index in range(len(self.index)):
+            yield self.frame(index)
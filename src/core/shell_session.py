@@ -0,0 +1,189 @@
+import re
+import socket
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+from utils import log_info, log_warning
+
+# The ack is printed with printf so the echoed command line never matches
+_ACK_PATTERN = re.compile(rb"__ack_(\d+)__")
+_ACK_COMMAND = "printf '__ack_%d__\\n' {seq}"
+# Trailing duration (ms) of `input [source] swipe|draganddrop x1 y1 x2 y2 ms`
+_DURATION_PATTERN = re.compile(r"\binput\b.*\b(?:swipe|draganddrop)(?:\s+-?\d+){4}\s+(\d+)\s*$")
+
+
+class ShellSessionError(Exception):
+    """A pipelined batch failed. ``sent`` is False only when no byte of it
+    reached the stream, i.e. when resending cannot run an input twice."""
+
+    def __init__(self, message: str, sent: bool = True):
+        super().__init__(message)
+        self.sent = sent
+
+
+def command_duration(command: str) -> float:
+    """Seconds the command itself takes on the device (swipe/drag durations)."""
+    match = _DURATION_PATTERN.search(command)
+    return int(match.group(1)) / 1000.0 if match else 0.0
+
+
+class _PendingCommand:
+    __slots__ = ("sent_at", "done", "rtt", "error")
+
+    def __init__(self, sent_at: float):
+        self.sent_at = sent_at
+        self.done = threading.Event()
+        self.rtt: Optional[float] = None
+        self.error: Optional[str] = None
+
+
+class ShellSession:
+    """Long-lived interactive ``sh`` on a device for pipelined input commands.
+
+    Each command is followed by a numbered ack that a reader thread matches
+    back to the caller, which gives the per-command round-trip time. A dead
+    stream is respawned on the next command. Acks are waited for up to
+    ``timeout`` plus the commands' own durations (long swipes).
+    """
+
+    def __init__(self, device, timeout: float = 5.0):
+        self.device = device
+        self.timeout = timeout
+        self._conn = None
+        self._reader: Optional[threading.Thread] = None
+        self._write_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._pending: Dict[int, _PendingCommand] = {}
+        self._seq = 0
+        self.alive = False
+
+        self.commands = 0
+        self.failures = 0
+        self.respawns = 0
+        self.total_rtt = 0.0
+        self.last_rtt = 0.0
+        self.max_rtt = 0.0
+
+    def start(self):
+        """Open the shell stream if it is not running; raises on failure."""
+        with self._write_lock:
+            if self.alive:
+                return
+            if self._conn is not None:
+                self.respawns += 1
+                log_warning(f"Respawning input shell for {self.device.serial}")
+            conn = self.device.create_connection()
+            conn.send("shell:")
+            conn.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            # No echo or prompt, only acks and command output come back
+            conn.socket.sendall(b"stty -echo 2>/dev/null; PS1=''; PS2=''\n")
+            self._conn = conn
+            self.alive = True
+            self._reader = threading.Thread(target=self._read_worker, args=(conn,), daemon=True)
+            self._reader.start()
+            log_info(f"Opened persistent input shell for {self.device.serial}")
+
+    def close(self):
+        with self._write_lock:
+            self._close_locked("Shell session closed")
+
+    def run(self, command: str) -> float:
+        """Run one command and return its round-trip time in seconds."""
+        return self.run_many([command])[-1]
+
+    def run_many(self, commands: Sequence[str]) -> List[float]:
+        """Pipeline commands on the stream, then wait for all of their acks."""
+        self.start()
+        pending = []
+        with self._write_lock:
+            if not self.alive:
+                raise ShellSessionError("Shell session is not running", sent=False)
+            payload = []
+            for command in commands:
+                self._seq += 1
+                entry = _PendingCommand(time.perf_counter())
+                with self._pending_lock:
+                    self._pending[self._seq] = entry
+                pending.append(entry)
+                payload.append(f"{command}; {_ACK_COMMAND.format(seq=self._seq)}\n")
+            data = "".join(payload).encode("utf-8")
+            written = 0
+            try:
+                while written < len(data):
+                    written += self._conn.socket.send(data[written:])
+            except OSError as e:
+                self._close_locked(f"Write failed: {e}")
+                self.failures += 1
+                raise ShellSessionError(f"Write failed: {e}", sent=written > 0)
+
+        # Commands run one after another, so each ack can come after all earlier durations
+        deadline = time.perf_counter() + self.timeout
+        rtts = []
+        for command, entry in zip(commands, pending):
+            deadline += command_duration(command)
+            if not entry.done.wait(max(0.0, deadline - time.perf_counter())):
+                self.close()
+                self.failures += 1
+                raise ShellSessionError(f"Timed out waiting for shell ack of '{command}'")
+            if entry.error:
+                self.failures += 1
+                raise ShellSessionError(entry.error)
+            rtts.append(entry.rtt)
+        return rtts
+
+    def get_stats(self) -> dict:
+        return {
+            "alive": self.alive,
+            "commands": self.commands,
+            "failures": self.failures,
+            "respawns": self.respawns,
+            "last_rtt_ms": self.last_rtt * 1000.0,
+            "mean_rtt_ms": self.total_rtt / self.commands * 1000.0 if self.commands else 0.0,
+            "max_rtt_ms": self.max_rtt * 1000.0,
+        }
+
+    def _close_locked(self, reason: str):
+        self.alive = False
+        if self._conn is not None:
+            self._conn.close()
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        for entry in pending.values():
+            entry.error = reason
+            entry.done.set()
+
+    def _read_worker(self, conn):
+        buffer = b""
+        while True:
+            try:
+                chunk = conn.socket.recv(4096)
+            except OSError:
+                chunk = b""
+            if not chunk:
+                break
+            buffer += chunk
+            last_end = 0
+            for match in _ACK_PATTERN.finditer(buffer):
+                self._acknowledge(int(match.group(1)))
+                last_end = match.end()
+            # Keep a short tail in case an ack is split across reads
+            buffer = buffer[last_end:][-64:]
+
+        with self._write_lock:
+            if self._conn is conn:
+                self._close_locked("Shell stream closed by device")
+
+    def _acknowledge(self, seq: int):
+        now = time.perf_counter()
+        with self._pending_lock:
+            # Commands run in order, so an ack also covers anything before it
+            done = [s for s in self._pending if s <= seq]
+            entries = [self._pending.pop(s) for s in done]
+        for entry in entries:
+            entry.rtt = now - entry.sent_at
+            self.commands += 1
+            self.total_rtt += entry.rtt
+            self.last_rtt = entry.rtt
+            self.max_rtt = max(self.max_rtt, entry.rtt)
+            entry.done.set()
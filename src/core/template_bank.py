@@ -0,0 +1,200 @@
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .frame import Frame
+from .matching import MIN_PYRAMID_TEMPLATE_SIDE, PYRAMID_THRESHOLD_SLACK, match_template
+from .template_cache import template_cache
+
+# Coarse scale used for the banked correlation pass
+DEFAULT_BANK_SCALE = 0.25
+# Peaks kept per member before full-resolution refinement
+DEFAULT_BANK_CANDIDATES = 3
+
+
+class _BankMember:
+    __slots__ = ("name", "path", "scale", "source", "spectrum", "norm", "size")
+
+    def __init__(self, name: str, path: str, scale: float):
+        self.name = name
+        self.path = path
+        self.scale = scale
+        self.source: Optional[np.ndarray] = None
+        self.spectrum: Optional[np.ndarray] = None
+        self.norm = 0.0
+        self.size = (0, 0)
+
+
+class TemplateBank:
+    """Matches a family of templates (e.g. puzzle pieces) against one frame.
+
+    The screen side of TM_CCOEFF_NORMED is computed once per frame and scale:
+    the grayscale DFT of the downscaled frame plus its integral images. Each
+    member then costs one spectrum multiply and one inverse DFT instead of a
+    full matchTemplate. Members too small for the base scale are banked at a
+    finer level (2x, 4x, ...) so every level still shares its spectrum.
+    Coarse peaks are refined at full resolution in small windows and turned
+    into a ranked one-to-one assignment of members to locations.
+    """
+
+    def __init__(self, templates: Dict[str, str], scale: float = DEFAULT_BANK_SCALE,
+                 candidates: int = DEFAULT_BANK_CANDIDATES):
+        self.scale = scale
+        self.candidates = candidates
+        self._lock = threading.Lock()
+        self.members: List[_BankMember] = []
+        for name, path in templates.items():
+            template = template_cache.get(path, True)
+            if template is None:
+                continue
+            member_scale = scale
+            while member_scale < 1.0 and min(template.shape[:2]) * member_scale < MIN_PYRAMID_TEMPLATE_SIDE:
+                member_scale = min(1.0, member_scale * 2)
+            self.members.append(_BankMember(name, path, member_scale))
+
+    @property
+    def levels(self) -> List[float]:
+        return sorted({member.scale for member in self.members})
+
+    @staticmethod
+    def _screen_side(frame: Frame, scale: float, roi: Optional[Tuple[int, int, int, int]]):
+        """DFT and integral images of the (cropped) downscaled gray frame, once per frame."""
+        def crop(image: np.ndarray) -> np.ndarray:
+            if roi is None:
+                return image
+            x0, y0, x1, y1 = (int(round(v * scale)) for v in roi)
+            return image[y0:y1, x0:x1]
+
+        screen = crop(frame.scaled(scale, True) if scale < 1.0 else frame.gray())
+
+        def spectrum(_) -> np.ndarray:
+            dft_h, dft_w = cv2.getOptimalDFTSize(screen.shape[0]), cv2.getOptimalDFTSize(screen.shape[1])
+            padded = np.zeros((dft_h, dft_w), np.float32)
+            padded[:screen.shape[0], :screen.shape[1]] = screen
+            return cv2.dft(padded, flags=cv2.DFT_COMPLEX_OUTPUT)
+
+        def integrals(_) -> np.ndarray:
+            total, squared = cv2.integral2(screen, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+            return np.stack([total, squared])
+
+        return (screen,
+                frame.derived(("bank_spectrum", scale, roi), spectrum),
+                frame.derived(("bank_integrals", scale, roi), integrals))
+
+    def _member_spectrum(self, member: _BankMember, dft_shape: Tuple[int, ...]) -> Optional[np.ndarray]:
+        """Zero-mean template spectrum for the given DFT size; rebuilt when the template reloads."""
+        template = (template_cache.get_scaled(member.path, True, member.scale) if member.scale < 1.0
+                    else template_cache.get(member.path, True))
+        if template is None:
+            return None
+        with self._lock:
+            if member.source is template and member.spectrum is not None and member.spectrum.shape == dft_shape:
+                return member.spectrum
+        zero_mean = template.astype(np.float32) - float(template.mean())
+        padded = np.zeros(dft_shape[:2], np.float32)
+        padded[:template.shape[0], :template.shape[1]] = zero_mean
+        spectrum = cv2.dft(padded, flags=cv2.DFT_COMPLEX_OUTPUT)
+        with self._lock:
+            member.source, member.spectrum = template, spectrum
+            member.norm = float((zero_mean.astype(np.float64) ** 2).sum())
+            member.size = template.shape[:2]
+        return spectrum
+
+    @staticmethod
+    def _window_sums(integral: np.ndarray, height: int, width: int) -> np.ndarray:
+        sums = integral[height:, width:] - integral[:-height, width:]
+        sums -= integral[height:, :-width]
+        sums += integral[:-height, :-width]
+        return sums
+
+    def _coarse_scores(self, member: _BankMember, screen: np.ndarray, spectrum: np.ndarray,
+                       integrals: np.ndarray) -> Optional[np.ndarray]:
+        """TM_CCOEFF_NORMED score map of one member on the downscaled screen."""
+        template_spectrum = self._member_spectrum(member, spectrum.shape)
+        template_h, template_w = member.size
+        screen_h, screen_w = screen.shape[:2]
+        if template_spectrum is None or template_h > screen_h or template_w > screen_w or member.norm <= 0:
+            return None
+        correlation = cv2.idft(cv2.mulSpectrums(spectrum, template_spectrum, 0, conjB=True),
+                               flags=cv2.DFT_REAL_OUTPUT | cv2.DFT_SCALE)
+        out_h, out_w = screen_h - template_h + 1, screen_w - template_w + 1
+        correlation = correlation[:out_h, :out_w]
+
+        # Window variance of the screen from the shared integral images
+        total, squared = integrals
+        window = self._window_sums(total, template_h, template_w)
+        variance = self._window_sums(squared, template_h, template_w)
+        window *= window
+        window /= float(template_h * template_w)
+        variance -= window
+        np.maximum(variance, 0.0, out=variance)
+        variance *= member.norm
+        denominator = np.sqrt(variance, out=variance)
+        scores = np.zeros((out_h, out_w), np.float32)
+        np.divide(correlation, denominator, out=scores, where=denominator > 1e-6 * member.norm)
+        return scores
+
+    def _refine(self, member: _BankMember, screen: np.ndarray, template: np.ndarray, scores: np.ndarray,
+                coarse_threshold: float, offset: Tuple[int, int]) -> List[Tuple[int, int, float]]:
+        """Full-resolution score and position of the best coarse peaks."""
+        template_h, template_w = template.shape[:2]
+        screen_h, screen_w = screen.shape[:2]
+        margin = int(np.ceil(1.0 / member.scale)) + 2
+        suppress = max(1, min(member.size) // 2)
+        refined = []
+        for _ in range(self.candidates):
+            _, coarse_val, _, coarse_loc = cv2.minMaxLoc(scores)
+            if coarse_val < coarse_threshold:
+                break
+            cx, cy = coarse_loc
+            scores[max(0, cy - suppress):cy + suppress + 1, max(0, cx - suppress):cx + suppress + 1] = -1.0
+            fx = int(round(cx / member.scale)) + offset[0]
+            fy = int(round(cy / member.scale)) + offset[1]
+            x0, y0 = max(0, fx - margin), max(0, fy - margin)
+            x1, y1 = min(screen_w, fx + template_w + margin), min(screen_h, fy + template_h + margin)
+            if x1 - x0 < template_w or y1 - y0 < template_h:
+                continue
+            max_val, max_loc = match_template(screen[y0:y1, x0:x1], template)
+            refined.append((max_loc[0] + x0, max_loc[1] + y0, max_val))
+        return refined
+
+    def match(self, frame: Frame, threshold: float = 0.8, use_grayscale: bool = True,
+              roi: Optional[Tuple[int, int, int, int]] = None) -> List[Tuple[str, int, int, float]]:
+        """Ranked assignment of members to locations: (name, x, y, confidence).
+
+        Every member appears at most once and no two members claim the same
+        spot; higher confidence wins. ``roi`` (x0, y0, x1, y1) limits the
+        search to the board area. Positions are top-left, like find_template.
+        """
+        full_screen = frame.gray() if use_grayscale else frame.image
+        offset = (roi[0], roi[1]) if roi is not None else (0, 0)
+        coarse_threshold = threshold - PYRAMID_THRESHOLD_SLACK
+
+        candidates = []
+        for level in self.levels:
+            screen, spectrum, integrals = self._screen_side(frame, level, roi)
+            for member in self.members:
+                if member.scale != level:
+                    continue
+                template = template_cache.get(member.path, use_grayscale)
+                scores = self._coarse_scores(member, screen, spectrum, integrals)
+                if template is None or scores is None:
+                    continue
+                for x, y, confidence in self._refine(member, full_screen, template, scores, coarse_threshold, offset):
+                    if confidence >= threshold:
+                        candidates.append((confidence, member.name, x, y, template.shape[1], template.shape[0]))
+
+        # Greedy one-to-one assignment, best score first
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        assigned, taken = [], []
+        for confidence, name, x, y, w, h in candidates:
+            if any(name == other for other, *_ in assigned):
+                continue
+            center_x, center_y = x + w // 2, y + h // 2
+            if any(tx <= center_x < tx + tw and ty <= center_y < ty + th for tx, ty, tw, th in taken):
+                continue
+            assigned.append((name, x, y, float(confidence)))
+            taken.append((x, y, w, h))
+        return assigned
@@ -0,0 +1,145 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+from utils import log_error
+
+# Default number of decoded templates kept in memory
+DEFAULT_MAX_ENTRIES = 256
+# Minimum seconds between two mtime checks of the same file
+DEFAULT_STAT_INTERVAL = 1.0
+
+
+class _CacheEntry:
+    __slots__ = ("image", "mtime", "size", "checked_at")
+
+    def __init__(self, image: np.ndarray, mtime: float, size: int, checked_at: float):
+        self.image = image
+        self.mtime = mtime
+        self.size = size
+        self.checked_at = checked_at
+
+
+class TemplateCache:
+    """Process-wide LRU cache of decoded templates keyed by (path, grayscale).
+
+    Entries are revalidated against the file mtime/size at most once every
+    ``stat_interval`` seconds, so a steady-state loop neither reads nor decodes
+    PNGs. Cached arrays are read-only; copy them before drawing on them.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, stat_interval: float = DEFAULT_STAT_INTERVAL):
+        self.max_entries = max_entries
+        self.stat_interval = stat_interval
+        self._entries: "OrderedDict[Tuple[str, bool], _CacheEntry]" = OrderedDict()
+        # (path, grayscale, scale) -> (source image, resized image)
+        self._scaled: Dict[Tuple[str, bool, float], Tuple[np.ndarray, np.ndarray]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.evictions = 0
+
+    def get(self, template_path: str, grayscale: bool = False) -> Optional[np.ndarray]:
+        key = (template_path, grayscale)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry.checked_at < self.stat_interval:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.image
+
+        try:
+            stat = os.stat(template_path)
+        except OSError:
+            with self._lock:
+                self._entries.pop(key, None)
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.mtime == stat.st_mtime and entry.size == stat.st_size:
+                entry.checked_at = now
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.image
+            if entry is not None:
+                self.reloads += 1
+            self.misses += 1
+
+        image = cv2.imread(template_path, cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR)
+        if image is None:
+            return None
+        image = np.ascontiguousarray(image, dtype=np.uint8)
+        image.flags.writeable = False
+
+        with self._lock:
+            self._entries[key] = _CacheEntry(image, stat.st_mtime, stat.st_size, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                for scaled_key in [k for k in self._scaled if k[:2] == evicted]:
+                    del self._scaled[scaled_key]
+                self.evictions += 1
+        return image
+
+    def get_scaled(self, template_path: str, grayscale: bool, scale: float) -> Optional[np.ndarray]:
+        """Template resized by ``scale``; rebuilt whenever the source reloads."""
+        image = self.get(template_path, grayscale)
+        if image is None:
+            return None
+        key = (template_path, grayscale, scale)
+        with self._lock:
+            cached = self._scaled.get(key)
+        if cached is not None and cached[0] is image:
+            return cached[1]
+        scaled = cv2.resize(image, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        scaled.flags.writeable = False
+        with self._lock:
+            self._scaled[key] = (image, scaled)
+        return scaled
+
+    def invalidate(self, template_path: Optional[str] = None):
+        """Drop one template (both color modes) or the whole cache."""
+        with self._lock:
+            if template_path is None:
+                self._entries.clear()
+                self._scaled.clear()
+                return
+            for grayscale in (False, True):
+                self._entries.pop((template_path, grayscale), None)
+            for key in [key for key in self._scaled if key[0] == template_path]:
+                del self._scaled[key]
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Shared by every automation instance in the process
+template_cache = TemplateCache()
+
+
+def load_template(template_path: str, grayscale: bool = False) -> Optional[np.ndarray]:
+    try:
+        template = template_cache.get(template_path, grayscale)
+        if template is None:
+            log_error(f"Could not load template {template_path}")
+        return template
+    except Exception as e:
+        log_error(f"Error loading template {template_path}: {e}")
+        return None
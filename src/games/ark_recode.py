@@ -1,8 +1,6 @@
-import time
 import asyncio
 from pathlib import Path
 from typing import Optional
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import numpy as np
 from src.core.adb_auto import ADBGameAutomation
@@ -16,8 +14,9 @@ class GameState(Enum):
 
 
 class ArkRecode(ADBGameAutomation):
-    def __init__(self):
-        ADBGameAutomation.__init__(self)
+    def __init__(self, **kwargs):
+        # kwargs go to ADBGameAutomation (device_id, capture_mode, adb, ...)
+        ADBGameAutomation.__init__(self, **kwargs)
 
         self.main_path = "assets/ark-recode"
         self.templates_dir = "assets/ark-recode/templates"
@@ -41,9 +40,7 @@ class ArkRecode(ADBGameAutomation):
         self.vr_go_to = f"{self.templates_dir}/vr_go_to.png"
         # Initialize game state tracking
         self.current_state = GameState.UNKNOWN
-        self.last_state_change = time.time()
-        # Create a thread pool for parallel execution
-        self.executor = ThreadPoolExecutor(max_workers=3)
+        self.last_state_change = self.clock.time()
 
     
     def process_game_actions(self):
@@ -1,8 +1,6 @@
-import time
 import asyncio
 from pathlib import Path
 from typing import Optional, Tuple
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import numpy as np
 from src.core.adb_auto import ADBGameAutomation
@@ -16,8 +14,9 @@ class GameState(Enum):
 
 
 class CherryTale(ADBGameAutomation):
-    def __init__(self):
-        ADBGameAutomation.__init__(self)
+    def __init__(self, **kwargs):
+        # kwargs go to ADBGameAutomation (device_id, capture_mode, adb, ...)
+        ADBGameAutomation.__init__(self, **kwargs)
 
         self.main_path = "assets/cherry_tale"
         self.templates_dir = "assets/cherry_tale/templates"
@@ -60,9 +59,7 @@ class CherryTale(ADBGameAutomation):
         self.thu_thach_battle = f"{self.templates_dir}/thu_thach_battle.png"
         # Initialize game state tracking
         self.current_state = GameState.UNKNOWN
-        self.last_state_change = time.time()
-        # Create a thread pool for parallel execution
-        self.executor = ThreadPoolExecutor(max_workers=3)
+        self.last_state_change = self.clock.time()
         self.is_scroll_up = False
         # Add pause functionality for GUI
         self.paused = False
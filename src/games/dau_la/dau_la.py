@@ -1,12 +1,11 @@
-import time
 import asyncio
 import os
 from pathlib import Path
 from typing import Optional, List, Tuple
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import numpy as np
 import cv2
 from src.core.adb_auto import ADBGameAutomation
+from src.core.template_bank import TemplateBank
 from src.utils.logging import setup_logger, log_error, log_state, log_warning, log_success, log_info
 from enum import Enum, auto
 
@@ -18,8 +17,9 @@ class GameState(Enum):
 
 
 class DauLa(ADBGameAutomation):
-    def __init__(self):
-        ADBGameAutomation.__init__(self)
+    def __init__(self, **kwargs):
+        # kwargs go to ADBGameAutomation (device_id, capture_mode, adb, ...)
+        ADBGameAutomation.__init__(self, **kwargs)
 
         self.main_path = "assets/dau-la"
         self.templates_dir = "assets/dau-la/templates"
@@ -55,13 +55,13 @@ class DauLa(ADBGameAutomation):
             '19': f"{self.templates_dir}/puzzle/19.png",
             '20': f"{self.templates_dir}/puzzle/20.png",
         } 
+        # All pieces are scored in one banked pass instead of 20 full-frame matches
+        self.puzzle_bank = TemplateBank(self.puzzle_path)
 
 
         # Initialize game state tracking
         self.current_state = GameState.UNKNOWN
-        self.last_state_change = time.time()
-                # Create a thread pool for parallel execution
-        self.executor = ThreadPoolExecutor(max_workers=3)
+        self.last_state_change = self.clock.time()
 
         self.duong_mon_path = {
             'duong_mon': f"{self.templates_dir}/duong_mon.png",
@@ -87,53 +87,64 @@ class DauLa(ADBGameAutomation):
         self.check_state()
         self.auto_duong_mon()
     
+    def classify_puzzle(self, threshold: float = 0.8) -> List[Tuple[str, int, int, float]]:
+        """Which puzzle piece sits where: (piece, x, y, confidence), best first."""
+        pieces = self.match_template_bank(self.puzzle_bank, threshold)
+        log_info(f"Puzzle pieces found: {len(pieces)}/{len(self.puzzle_path)}")
+        return pieces
+
     def check_state(self):
         print("check_state")
         if self.find_template(self.check_state_path['is_duon_mon']):
             self.current_state = GameState.DUONG_MON
-            self.last_state_change = time.time()
+            self.last_state_change = self.clock.time()
         else:
             self.current_state = GameState.MAIN_MENU
-            self.last_state_change = time.time()
+            self.last_state_change = self.clock.time()
 
     def auto_duong_mon(self):
         if self.current_state != GameState.DUONG_MON:
-            self.find_and_tap(self.duong_mon_path['duong_mon'])
-            time.sleep(1.5)
+            # Returns once the Duong Mon screen shows up, at most after the old 1.5s sleep
+            self.find_and_tap_verify(self.duong_mon_path['duong_mon'], expect=self.check_state_path['is_duon_mon'],
+                                     timeout=1.5)
         else:
+            # Each claim returns as soon as the reward icon is gone, at most after the old 0.5s sleep
             if self.find_template(self.duong_mon_path['duong_mon_reward']):
                 for i in range(1, 10):
-                    self.find_and_tap(self.duong_mon_path['duong_mon_reward'])
-                    time.sleep(0.5)
+                    self.find_and_tap_verify(self.duong_mon_path['duong_mon_reward'], timeout=0.5)
             elif self.find_template(self.duong_mon_path['duong_mon_reward_2']):
                 for i in range(1, 5):
-                    self.find_and_tap(self.duong_mon_path['duong_mon_reward_2'])
-                    time.sleep(0.5)
+                    self.find_and_tap_verify(self.duong_mon_path['duong_mon_reward_2'], timeout=0.5)
 
             if self.find_template(self.duong_mon_path['duong_mon_vo_duong']) and self.duong_mon_vo_duong == False:
-                self.find_and_tap(self.duong_mon_path['duong_mon_vo_duong'])
-                time.sleep(1.5)
+                # The Vo Duong screen is open once its back button shows
+                self.find_and_tap_verify(self.duong_mon_path['duong_mon_vo_duong'],
+                                         expect=self.duong_mon_path['duong_mon_vo_duong_back'], timeout=1.5)
                 while self.duong_mon_vo_duong == False:
                     if not self.find_template(self.duong_mon_path['duong_mon_vo_duong_quest']):
-                        self.find_and_tap(self.duong_mon_path['duong_mon_vo_duong_back'])
+                        self.find_and_tap_verify(self.duong_mon_path['duong_mon_vo_duong_back'], timeout=0.5)
                         self.duong_mon_vo_duong = True
-                        time.sleep(0.5)
                     else:
                         while self.find_template(self.duong_mon_path['duong_mon_vo_duong_quest']):
-                            if self.find_and_tap(self.duong_mon_path['duong_mon_vo_duong_quest']): 
-                                 self.wait_and_tap(self.duong_mon_path['duong_mon_vo_duong_quick_quest'])
-                            time.sleep(0.5)
+                            if self.find_and_tap_verify(self.duong_mon_path['duong_mon_vo_duong_quest'],
+                                                        expect=self.duong_mon_path['duong_mon_vo_duong_quick_quest'],
+                                                        timeout=30.0):
+                                # Done once the quick quest panel has closed
+                                self.find_and_tap_verify(self.duong_mon_path['duong_mon_vo_duong_quick_quest'],
+                                                         timeout=0.5, threshold=0.9)
                             break
             elif self.find_template(self.duong_mon_path['duong_mon_dai_ngo']) and self.duong_mon_dai_ngo == False:
                 self.thang_cap = False
-                self.find_and_tap(self.duong_mon_path['duong_mon_dai_ngo'])
-                time.sleep(1.5)
+                # Goes on as soon as a target shows; with none it waits the old 2s before going back
+                self.find_and_tap_verify(self.duong_mon_path['duong_mon_dai_ngo'],
+                                         expect=self.duong_mon_path['muc_tieu_dai_ngo'], timeout=2.0)
                 while self.thang_cap == False:
-                    time.sleep(0.5)
                     if not self.find_template(self.duong_mon_path['muc_tieu_dai_ngo']):
-                        self.find_and_tap(self.duong_mon_path['duong_mon_vo_duong_back'])
+                        self.find_and_tap_verify(self.duong_mon_path['duong_mon_vo_duong_back'], timeout=0.5)
                         self.duong_mon_dai_ngo = True
+                        break
                     else:
+                        # No template for the upgrade panel, so its button is tapped blind
                         self.find_and_tap(self.duong_mon_path['muc_tieu_dai_ngo'])
                         self.tap(1692, 930)
                         self.thang_cap = True
@@ -1,8 +1,6 @@
-import time
 import asyncio
 from pathlib import Path
 from typing import Optional
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import numpy as np
 from src.core.adb_auto import ADBGameAutomation
 from src.utils.logging import setup_logger, log_error, log_state, log_warning, log_success, log_info
@@ -15,8 +13,9 @@ class GameState(Enum):
 
 
 class Template(ADBGameAutomation):
-    def __init__(self):
-        ADBGameAutomation.__init__(self)
+    def __init__(self, **kwargs):
+        # kwargs go to ADBGameAutomation (device_id, capture_mode, adb, ...)
+        ADBGameAutomation.__init__(self, **kwargs)
 
         self.main_path = "assets/template"
         self.templates_dir = "assets/template/templates"
@@ -26,9 +25,7 @@ class Template(ADBGameAutomation):
         }
         # Initialize game state tracking
         self.current_state = GameState.UNKNOWN
-        self.last_state_change = time.time()
-        # Create a thread pool for parallel execution
-        self.executor = ThreadPoolExecutor(max_workers=3)
+        self.last_state_change = self.clock.time()
 
     
     def process_game_actions(self):